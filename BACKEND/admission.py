@@ -0,0 +1,62 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class Saturated(Exception):
+    """Raised when a request cannot be admitted; the caller answers 503."""
+
+
+class AdmissionController:
+    """
+    Bounded concurrency for the event loop: at most max_in_flight requests
+    run at once, at most max_queued wait for a slot, and a waiting request
+    gives up after queue_timeout seconds. Everything beyond that is rejected
+    immediately instead of piling up behind slow upstream calls.
+    """
+
+    def __init__(self, max_in_flight: int, max_queued: int, queue_timeout: float):
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+
+    async def acquire(self):
+        """Wait for a slot, or raise Saturated. Pair with release()."""
+        # Counted synchronously, so concurrent arrivals cannot all slip past.
+        if self.in_flight + self.queued >= self.max_in_flight + self.max_queued:
+            self.rejected += 1
+            raise Saturated("request queue is full")
+
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Saturated("timed out waiting for a free slot")
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "max_in_flight": self.max_in_flight,
+            "max_queued": self.max_queued
+        }
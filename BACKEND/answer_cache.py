@@ -0,0 +1,114 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+def unit_vector(vector):
+    norm = math.sqrt(sum(x * x for x in vector))
+    return tuple(x / norm for x in vector) if norm else tuple(vector)
+
+
+def context_key(*parts: str):
+    """Digest of everything besides the question that shapes the answer."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SemanticAnswerCache:
+    """
+    Answers to earlier questions, reused for a paraphrase. A stored answer is
+    returned only when the new question's embedding has cosine similarity of
+    at least `threshold` with the stored one and the prompt context (packed
+    chunks plus conversation) is identical, so near-duplicates never borrow
+    an answer grounded in different law text.
+
+    Entries are LRU-bounded, expire after ttl_seconds, and are all dropped
+    when the generation (index version, prompt version) changes.
+    """
+
+    def __init__(self, max_entries: int, threshold: float, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        # context key -> entry keys, so a lookup only compares questions
+        # that were answered from the same context.
+        self._by_context = {}
+        self._context_of = {}
+        self._lock = threading.Lock()
+        self._next_key = 0
+        self.generation = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_generation(self, generation):
+        if generation != self.generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._by_context.clear()
+            self._context_of.clear()
+            self.generation = generation
+
+    def get(self, embedding, context: str, generation):
+        query = unit_vector(embedding)
+        now = time.monotonic()
+        with self._lock:
+            self._check_generation(generation)
+            best_key, best_score = None, self.threshold
+            for key in list(self._by_context.get(context, ())):
+                stored, _, expires_at = self._entries[key]
+                if expires_at <= now:
+                    self._remove(key)
+                    continue
+                score = sum(a * b for a, b in zip(query, stored))
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key][1]
+
+    def set(self, embedding, context: str, generation, answer: str):
+        if self.max_entries <= 0 or not answer:
+            return
+        with self._lock:
+            self._check_generation(generation)
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = (unit_vector(embedding), answer, time.monotonic() + self.ttl_seconds)
+            self._by_context.setdefault(context, []).append(key)
+            self._context_of[key] = context
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        del self._entries[key]
+        context = self._context_of.pop(key)
+        keys = self._by_context[context]
+        keys.remove(key)
+        if not keys:
+            del self._by_context[context]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "threshold": self.threshold,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,458 @@
+"""
+Offline load test of the /chat API.
+
+Gemini, the vector index and the embedding service are replaced by local
+stand-ins with configurable latency and jitter, and a synthetic corpus of
+numbered sections is indexed into a temporary local store. The FastAPI app
+is served by uvicorn on a loopback port inside this process (so streamed
+responses really arrive incrementally) and driven at fixed concurrency
+levels with a mix of section lookups, scenario questions and follow-ups
+that carry history. Results
+(throughput, p50/p95/p99 latency, status counts, upstream calls per request,
+mean server-side time per stage and prompt size) are written as JSON.
+
+    cd BACKEND && python benchmarks/loadtest.py --levels 1,8,32 --requests 200
+"""
+import os
+import sys
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+ACTS = ("BNS", "BNSS", "BSA")
+DIMENSION = 384
+
+LEGAL_TERMS = [
+    "culpable homicide", "cognizable offence", "anticipatory bail", "theft", "robbery",
+    "criminal intimidation", "cheating", "dowry death", "kidnapping", "defamation",
+    "search warrant", "arrest without warrant", "police report", "magistrate", "charge sheet",
+    "electronic record", "confession", "dying declaration", "burden of proof", "witness"
+]
+FILLER = (
+    "Whoever commits the offence described in this section shall be punished with imprisonment "
+    "of either description for a term which may extend to seven years, and shall also be liable "
+    "to fine. Explanation. For the purposes of this section the expression includes any act done "
+    "with the intention or knowledge described above. Illustration. A does the act with intent "
+    "to cause wrongful gain to himself or wrongful loss to B. "
+)
+SCENARIOS = [
+    "What happens if someone commits {term} against me?",
+    "Can I be arrested for {term} without a warrant?",
+    "Suppose a person is accused of {term}, what is the punishment?",
+    "Is {term} a bailable offence?",
+    "What should I do if a case of {term} is filed against me?"
+]
+
+
+class Latency:
+    """Gaussian latency in milliseconds, clipped at zero."""
+
+    def __init__(self, mean_ms: float, jitter_ms: float, rng: random.Random):
+        self.mean_ms = mean_ms
+        self.jitter_ms = jitter_ms
+        self._rng = rng
+        self._lock = threading.Lock()
+
+    def sample(self):
+        with self._lock:
+            return max(0.0, self._rng.gauss(self.mean_ms, self.jitter_ms)) / 1000
+
+    def describe(self):
+        return {"mean_ms": self.mean_ms, "jitter_ms": self.jitter_ms}
+
+
+class Upstream:
+    """Call and wait counters for one stand-in service."""
+
+    def __init__(self, name: str, latency: Latency):
+        self.name = name
+        self.latency = latency
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.wait_seconds = 0.0
+
+    def wait(self):
+        seconds = self.latency.sample()
+        with self._lock:
+            self.calls += 1
+            self.wait_seconds += seconds
+        return seconds
+
+
+def hashed_embedding(text: str):
+    """Deterministic bag-of-words vector, so similar texts land near each other."""
+    vector = [0.0] * DIMENSION
+    for token in re.findall(r"[a-z0-9]+", text.lower()):
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest()
+        slot = int.from_bytes(digest, "little")
+        vector[slot % DIMENSION] += 1.0 if slot & 1 << 31 else -1.0
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+class FakeEmbedder:
+    backend = "fake"
+
+    def __init__(self, upstream: Upstream):
+        self.upstream = upstream
+
+    def embed_many(self, texts: list[str]):
+        time.sleep(self.upstream.wait())
+        return [hashed_embedding(text) for text in texts]
+
+    def embed(self, text: str):
+        return self.embed_many([text])[0]
+
+
+class FakeIndex:
+    """The local store behind a simulated network round trip."""
+
+    def __init__(self, index, upstream: Upstream):
+        self._index = index
+        self.upstream = upstream
+
+    def query(self, *args, **kwargs):
+        time.sleep(self.upstream.wait())
+        return self._index.query(*args, **kwargs)
+
+    def fetch(self, *args, **kwargs):
+        time.sleep(self.upstream.wait())
+        return self._index.fetch(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._index, name)
+
+    def __contains__(self, vector_id):
+        return vector_id in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+
+class FakeLLM:
+    """Gemini stand-in: a fixed answer after a sampled delay, streamed in pieces."""
+
+    ANSWER = ("Section 1 - Legal provisions. " + FILLER) * 2
+
+    def __init__(self, upstream: Upstream, token_ms: float):
+        self.upstream = upstream
+        self.token_ms = token_ms
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.prompt_chars = []
+
+    def _record(self, prompt: str):
+        with self._lock:
+            self.prompt_chars.append(len(prompt))
+
+    def invoke(self, prompt: str):
+        self._record(prompt)
+        time.sleep(self.upstream.wait())
+        return SimpleNamespace(content=self.ANSWER)
+
+    async def ainvoke(self, prompt: str):
+        self._record(prompt)
+        await asyncio.sleep(self.upstream.wait())
+        return SimpleNamespace(content=self.ANSWER)
+
+    async def astream(self, prompt: str):
+        self._record(prompt)
+        await asyncio.sleep(self.upstream.wait())
+        for piece in re.findall(r"\S+\s*", self.ANSWER):
+            await asyncio.sleep(self.token_ms / 1000)
+            yield SimpleNamespace(content=piece)
+
+
+def synthetic_chunks(sections_per_act: int, rng: random.Random):
+    """One chunk per numbered section, each mentioning a couple of legal terms."""
+    for act in ACTS:
+        for number in range(1, sections_per_act + 1):
+            terms = rng.sample(LEGAL_TERMS, 2)
+            text = f"{number}. Of {terms[0]}. " + FILLER * 3 + f"This provision also covers {terms[1]}."
+            yield {"id": f"{act}-{number:04d}", "text": text, "source": act}
+
+
+def build_corpus(sections_per_act: int, rng: random.Random):
+    """Write the section, BM25 and local vector artifacts the app reads; chunk text comes from the vector store."""
+    from sections import SectionIndexBuilder
+    from lexical import BM25IndexBuilder
+    from vector_store import LocalVectorStore
+
+    section_index = SectionIndexBuilder()
+    lexical_index = BM25IndexBuilder()
+    store = LocalVectorStore(os.environ["LOCAL_INDEX_DIR"])
+    vectors = []
+    for chunk in synthetic_chunks(sections_per_act, rng):
+        sections = section_index.add(chunk)
+        lexical_index.add(chunk)
+        metadata = {"text": chunk["text"], "source": chunk["source"]}
+        if sections:
+            metadata["section"] = sections[0]
+        vectors.append({"id": chunk["id"], "values": hashed_embedding(chunk["text"]), "metadata": metadata})
+
+    store.upsert(vectors=vectors)
+    store.flush()
+    section_index.save(os.environ["SECTION_INDEX_PATH"])
+    lexical_index.save(os.environ["BM25_INDEX_PATH"])
+    return len(vectors)
+
+
+def make_request(kind: str, sections_per_act: int, rng: random.Random):
+    if kind == "section":
+        act = rng.choice(ACTS)
+        return {"query": f"What does section {rng.randint(1, sections_per_act)} of {act} say?"}
+
+    query = rng.choice(SCENARIOS).format(term=rng.choice(LEGAL_TERMS))
+    if kind == "scenario":
+        return {"query": query}
+
+    history = []
+    for _ in range(rng.randint(2, 8)):
+        history.append({"role": "user", "content": rng.choice(SCENARIOS).format(term=rng.choice(LEGAL_TERMS))})
+        history.append({"role": "assistant", "content": FakeLLM.ANSWER})
+    return {"query": f"And what about {rng.choice(LEGAL_TERMS)}?", "conversation_history": history}
+
+
+def percentile(sorted_values: list[float], pct: float):
+    if not sorted_values:
+        return None
+    rank = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def parse_server_timing(header: str):
+    """{stage: ms} from a Server-Timing header."""
+    timings = {}
+    for entry in filter(None, (part.strip() for part in header.split(","))):
+        name, _, duration = entry.partition(";dur=")
+        if duration:
+            timings[name] = float(duration)
+    return timings
+
+
+async def read_stream(response, start: float):
+    """
+    Seconds from start to the first token event (or None) and the stage
+    timings from the "done" event; the body is consumed either way.
+    """
+    first_token = None
+    timings = {}
+    event = None
+    async for line in response.aiter_lines():
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+            if first_token is None and event == "token":
+                first_token = time.perf_counter() - start
+        elif line.startswith("data: ") and event == "done":
+            timings = json.loads(line[len("data: "):]).get("timings", {})
+    return first_token, timings
+
+
+async def run_level(client, concurrency: int, requests: list[dict], stream: bool, upstreams: dict, llm: FakeLLM):
+    for upstream in upstreams.values():
+        upstream.reset()
+    llm.reset()
+
+    pending = list(reversed(requests))
+    latencies = []
+    first_tokens = []
+    stage_ms = {}
+    statuses = Counter()
+
+    async def worker():
+        while pending:
+            body = pending.pop()
+            start = time.perf_counter()
+            try:
+                if stream:
+                    async with client.stream("POST", "/chat/stream", json=body) as response:
+                        first_token, timings = await read_stream(response, start)
+                    if first_token is not None:
+                        first_tokens.append(first_token)
+                    status = str(response.status_code)
+                else:
+                    response = await client.post("/chat", json=body)
+                    timings = parse_server_timing(response.headers.get("server-timing", ""))
+                    status = str(response.status_code)
+                    if response.status_code == 200 and response.json().get("error"):
+                        status = "200-error"
+            except Exception as e:
+                status = type(e).__name__
+                timings = {}
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+            for name, ms in timings.items():
+                stage_ms.setdefault(name, []).append(ms)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    def summary_ms(values):
+        values = sorted(values)
+        return {
+            "p50": percentile(values, 50) * 1000,
+            "p95": percentile(values, 95) * 1000,
+            "p99": percentile(values, 99) * 1000,
+            "mean": sum(values) / len(values) * 1000,
+            "max": values[-1] * 1000
+        } if values else None
+
+    count = len(requests)
+    return {
+        "concurrency": concurrency,
+        "requests": count,
+        "elapsed_s": elapsed,
+        "throughput_rps": count / elapsed,
+        "latency_ms": summary_ms(latencies),
+        "first_token_ms": summary_ms(first_tokens) if stream else None,
+        "statuses": dict(statuses),
+        "upstream": {
+            name: {
+                "calls_per_request": upstream.calls / count,
+                "mean_wait_ms": upstream.wait_seconds / upstream.calls * 1000 if upstream.calls else 0.0
+            }
+            for name, upstream in upstreams.items()
+        },
+        # Mean server-side time per stage, over the requests that ran it.
+        "stages_ms": {name: sum(values) / len(values) for name, values in sorted(stage_ms.items())},
+        "prompt_tokens_mean": sum(llm.prompt_chars) / len(llm.prompt_chars) / 4 if llm.prompt_chars else None
+    }
+
+
+def parse_mix(text: str):
+    mix = {}
+    for part in text.split(","):
+        kind, weight = part.split("=")
+        if kind not in ("section", "scenario", "followup"):
+            raise argparse.ArgumentTypeError(f"unknown query kind {kind!r}")
+        mix[kind] = float(weight)
+    return mix
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--levels", default="1,4,16,32", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=100, help="requests per level")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("section=0.3,scenario=0.5,followup=0.2"))
+    parser.add_argument("--stream", action="store_true", help="drive /chat/stream instead of /chat")
+    parser.add_argument("--no-cache", action="store_true", help="disable query, retrieval and answer caches")
+    parser.add_argument("--sections", type=int, default=150, help="synthetic sections per act")
+    parser.add_argument("--llm-ms", type=float, nargs=2, default=[500, 150], metavar=("MEAN", "JITTER"))
+    parser.add_argument("--token-ms", type=float, default=2, help="delay between streamed tokens")
+    parser.add_argument("--index-ms", type=float, nargs=2, default=[40, 15], metavar=("MEAN", "JITTER"))
+    parser.add_argument("--embed-ms", type=float, nargs=2, default=[25, 10], metavar=("MEAN", "JITTER"))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default="loadtest_results.json")
+    return parser.parse_args()
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    upstreams = {
+        "llm": Upstream("llm", Latency(*args.llm_ms, random.Random(args.seed + 1))),
+        "index": Upstream("index", Latency(*args.index_ms, random.Random(args.seed + 2))),
+        "embedding": Upstream("embedding", Latency(*args.embed_ms, random.Random(args.seed + 3)))
+    }
+
+    chunk_count = build_corpus(args.sections, rng)
+
+    import bot
+    import httpx
+    import uvicorn
+
+    llm = FakeLLM(upstreams["llm"], args.token_ms)
+    bot.llm.set(llm)
+    bot.embedder.set(FakeEmbedder(upstreams["embedding"]))
+    # The version tracker binds to the local store before it is wrapped.
+    bot.index_version.get()
+    bot.index.set(FakeIndex(bot.index.get(), upstreams["index"]))
+
+    server = uvicorn.Server(uvicorn.Config(bot.app, host="127.0.0.1", port=0, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+
+    kinds, weights = zip(*args.mix.items())
+    levels = []
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limits) as client:
+        for concurrency in (int(level) for level in args.levels.split(",")):
+            requests = [
+                make_request(rng.choices(kinds, weights)[0], args.sections, rng)
+                for _ in range(args.requests)
+            ]
+            result = await run_level(client, concurrency, requests, args.stream, upstreams, llm)
+            levels.append(result)
+            latency = result["latency_ms"]
+            print(f"concurrency {concurrency:>3}: {result['throughput_rps']:6.1f} req/s, "
+                  f"p50 {latency['p50']:7.1f} ms, p95 {latency['p95']:7.1f} ms, "
+                  f"p99 {latency['p99']:7.1f} ms, statuses {result['statuses']}")
+
+    server.should_exit = True
+    await serving
+
+    return {
+        "config": {
+            "endpoint": "/chat/stream" if args.stream else "/chat",
+            "requests_per_level": args.requests,
+            "mix": args.mix,
+            "caches": not args.no_cache,
+            "chunks": chunk_count,
+            "seed": args.seed,
+            "latency": {name: upstream.latency.describe() for name, upstream in upstreams.items()},
+            "max_in_flight": bot.MAX_IN_FLIGHT_REQUESTS,
+            "max_queued": bot.MAX_QUEUED_REQUESTS,
+            "rag_worker_threads": bot.RAG_WORKER_THREADS
+        },
+        "levels": levels
+    }
+
+
+def main():
+    args = parse_args()
+    output = os.path.abspath(args.output)
+    with tempfile.TemporaryDirectory(prefix="lawgpt-loadtest-") as workdir:
+        # Everything the app reads at import time points into the scratch directory.
+        os.environ.update({
+            "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY") or "offline",
+            "EMBEDDING_BACKEND": "remote",
+            "VECTOR_BACKEND": "local",
+            "LOCAL_INDEX_DIR": os.path.join(workdir, "local_index"),
+            "SECTION_INDEX_PATH": os.path.join(workdir, "section_index.json"),
+            "BM25_INDEX_PATH": os.path.join(workdir, "bm25_index.json"),
+            "CHUNK_STORE_DIR": os.path.join(workdir, "chunk_store"),
+            "SESSION_BACKEND": "memory",
+            "RERANK_ENABLED": "false",
+            "EXPOSE_TIMINGS": "true"
+        })
+        if args.no_cache:
+            os.environ.update({"QUERY_CACHE_SIZE": "0", "ANSWER_CACHE_SIZE": "0"})
+        os.chdir(BACKEND_DIR)
+        results = asyncio.run(run(args))
+
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
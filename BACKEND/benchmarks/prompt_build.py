@@ -0,0 +1,68 @@
+"""
+Micro-benchmark of per-request prompt assembly.
+
+Compares the old path (re-read system_prompt.txt, str.format, replace,
+format again) with PromptTemplate on a full-size context: 15 chunks of
+~1500 characters per act plus 16 messages of history.
+
+    cd BACKEND && python benchmarks/prompt_build.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt import PromptTemplate, render_prompt
+
+PROMPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "system_prompt.txt")
+
+CHUNK = ("103. (1) Whoever commits murder shall be punished with death or imprisonment for life, "
+         "and shall also be liable to fine. ") * 14
+CONTEXT = "\n\n".join(
+    f"=== {act} ===\n\n" + "\n\n".join([CHUNK] * 15) for act in ("BNS", "BNSS", "BSA")
+)
+HISTORY = [
+    {"role": "user" if i % 2 == 0 else "assistant", "content": "What is the punishment for theft? " * 10}
+    for i in range(16)
+]
+QUERY = "And what if the theft happens at night?"
+
+
+def legacy_build(context: str, query: str, conversation_history: list[dict]):
+    with open(PROMPT_PATH, "r", encoding="utf-8") as f:
+        prompt_template = f.read()
+
+    conversation_context = ""
+    if conversation_history:
+        conversation_context = "\n\n=== PREVIOUS CONVERSATION ===\n"
+        for msg in conversation_history[-16:]:
+            role = msg.get("role", "user")
+            content = msg.get("content", "")
+            if role == "user":
+                conversation_context += f"User: {content}\n"
+            elif role == "assistant":
+                conversation_context += f"Assistant: {content}\n"
+        conversation_context += "\n=== END OF PREVIOUS CONVERSATION ===\n\n"
+
+    prompt = prompt_template.format(context=context, query=query)
+    if conversation_context:
+        prompt = prompt.replace("{query}", f"{conversation_context}Current Question: {{query}}")
+        prompt = prompt.format(query=query)
+    return prompt
+
+
+def main(number: int = 2000):
+    template = PromptTemplate(PROMPT_PATH)
+    cases = {
+        "legacy (read + format)": lambda: legacy_build(CONTEXT, QUERY, HISTORY),
+        "PromptTemplate.render": lambda: render_prompt(template, CONTEXT, QUERY, HISTORY),
+    }
+    print(f"context {len(CONTEXT)} chars, {len(HISTORY)} history messages, {number} builds each")
+    for name, build in cases.items():
+        seconds = min(timeit.repeat(build, number=number, repeat=5)) / number
+        print(f"{name:<24} {seconds * 1e6:8.1f} us/build")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,91 @@
 import os
+import asyncio
+import json
+import time
+
+# Cold-start time is measured from here, before the heavy imports below.
+STARTED = time.perf_counter()
+
+from typing import Optional
+from contextlib import asynccontextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextvars import copy_context
+from functools import partial
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.documents import Document
-from pinecone import Pinecone
-from huggingface_hub import InferenceClient
+from embedder import EMBEDDING_MODEL, load_embedder
+from vector_store import VECTOR_BACKEND, ChunkStore, IndexVersion, open_index, vector_count
+from sections import SectionIndex
+from lexical import BM25Index, reciprocal_rank_fusion
+from reranker import RERANK_CANDIDATES, RERANK_KEEP, load_reranker
+from admission import AdmissionController, Saturated
+from prompt import PromptTemplate, format_conversation, render_prompt
+from context import CONTEXT_TOKEN_BUDGET, estimate_tokens, pack_context
+from timing import begin_request, record, server_timing, stage
+from metrics import TOKEN_BUCKETS, Counter, Histogram, render_samples
+from cache import TTLCache, normalize_query
+from answer_cache import SemanticAnswerCache, context_key
+from sessions import add_turn, new_session, open_session_store
+from startup import WARMUP_ENABLED, LazyResource, Startup
+from transport import EMBEDDING, INDEX, LLM, UPSTREAMS, llm_client_args, upstream_seconds, upstream_wait_seconds
 
 
 load_dotenv()
 
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-HF_API_KEY = os.getenv("HF_API_KEY")
 
-INDEX_NAME = "lawgpt"
-HF_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# Query embedding and retrieval caches: entries, lifetime and memory cap.
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", "3600"))
+QUERY_CACHE_MAX_MB = float(os.getenv("QUERY_CACHE_MAX_MB", "64"))
+
+# Answers reused for paraphrased questions: entries, minimum cosine
+# similarity between the questions, and lifetime.
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+
+# General queries search each act separately: PER_ACT_TOP_K vector matches
+# and LEXICAL_TOP_K BM25 hits, fused with reciprocal rank fusion (RRF_K damps
+# the weight of top ranks) and cut to PER_ACT_RESULTS.
+ACTS = ("BNS", "BNSS", "BSA")
+PER_ACT_TOP_K = int(os.getenv("PER_ACT_TOP_K", "8"))
+LEXICAL_TOP_K = int(os.getenv("LEXICAL_TOP_K", "8"))
+PER_ACT_RESULTS = int(os.getenv("PER_ACT_RESULTS", "10"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Characters of each retrieved chunk sent back as a source preview.
+SOURCE_EXCERPT_CHARS = 200
+
+# Blocking retrieval work runs on this many threads. At most
+# MAX_IN_FLIGHT_REQUESTS answers are generated at once, MAX_QUEUED_REQUESTS
+# more may wait up to QUEUE_TIMEOUT_SECONDS, and the rest get a 503.
+RAG_WORKER_THREADS = int(os.getenv("RAG_WORKER_THREADS", "8"))
+MAX_IN_FLIGHT_REQUESTS = int(os.getenv("MAX_IN_FLIGHT_REQUESTS", "32"))
+MAX_QUEUED_REQUESTS = int(os.getenv("MAX_QUEUED_REQUESTS", "64"))
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("QUEUE_TIMEOUT_SECONDS", "10"))
+FANOUT_THREADS = int(os.getenv("FANOUT_THREADS", "16"))
+
+# When true, /chat answers carry a Server-Timing header with the per-stage
+# breakdown, and the stream's "done" event a "timings" field.
+EXPOSE_TIMINGS = os.getenv("EXPOSE_TIMINGS", "false").lower() == "true"
+
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start serving at once; upstream clients are built in the background until /health/ready passes."""
+    startup.imported()
+    warmup = asyncio.create_task(startup.warm_up()) if WARMUP_ENABLED else None
+    yield
+    if warmup is not None:
+        warmup.cancel()
 
-app = FastAPI(title="RAG Chatbot API")
+
+app = FastAPI(title="RAG Chatbot API", lifespan=lifespan)
 
 
 app.add_middleware(
@@ -31,41 +97,168 @@ app.add_middleware(
 )
 
 
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",
-    google_api_key=GOOGLE_API_KEY,
-    temperature=0.1,  
-    max_output_tokens=1800  
-)
+rag_executor = ThreadPoolExecutor(max_workers=RAG_WORKER_THREADS, thread_name_prefix="rag")
+# Separate pool for index queries issued from inside RAG threads, so a full
+# rag_executor can never wait on itself.
+fanout_executor = ThreadPoolExecutor(max_workers=FANOUT_THREADS, thread_name_prefix="fanout")
+admission = AdmissionController(MAX_IN_FLIGHT_REQUESTS, MAX_QUEUED_REQUESTS, QUEUE_TIMEOUT_SECONDS)
+
+# Exported on /metrics. Stages nest (e.g. "embed" runs inside "retrieve"), so
+# stage times overlap rather than add up to the request time.
+stage_seconds = Histogram("lawgpt_stage_seconds", "Time spent in each request stage.", ("stage",))
+request_seconds = Histogram("lawgpt_request_seconds", "End-to-end request time.", ("endpoint",))
+requests_total = Counter("lawgpt_requests_total", "Requests by endpoint and outcome.", ("endpoint", "outcome"))
+prompt_tokens = Histogram("lawgpt_prompt_tokens", "Prompt tokens sent to the LLM.", buckets=TOKEN_BUCKETS)
+response_tokens = Histogram("lawgpt_response_tokens", "Answer tokens received from the LLM.", buckets=TOKEN_BUCKETS)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call on the RAG thread pool without stalling the event loop."""
+    loop = asyncio.get_running_loop()
+    # copy_context carries the request's timing dict into the worker thread.
+    return await loop.run_in_executor(rag_executor, partial(copy_context().run, func, *args, **kwargs))
+
+
+def load_llm():
+    from langchain_google_genai import ChatGoogleGenerativeAI
 
+    return ChatGoogleGenerativeAI(
+        model="gemini-2.5-flash",
+        google_api_key=GOOGLE_API_KEY,
+        temperature=0.1,  
+        max_output_tokens=1800,
+        timeout=LLM.timeout,
+        client_args=llm_client_args(LLM)
+    )
+
+
+# Upstream clients and models are built by the warm-up in lifespan (or the
+# first request to need them), never at import.
+llm = LazyResource("llm", load_llm)
+embedder = LazyResource("embedder", load_embedder)
+reranker = LazyResource("reranker", load_reranker, required=False)
+index = LazyResource("index", open_index)
+index_version = LazyResource("index_version", lambda: IndexVersion(index.get()))
+startup = Startup([llm, embedder, reranker, index, index_version], STARTED)
+
+embedding_cache = TTLCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL_SECONDS, int(QUERY_CACHE_MAX_MB * 2**20))
+retrieval_cache = TTLCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL_SECONDS, int(QUERY_CACHE_MAX_MB * 2**20))
+# Reranked results, kept only when the rerank finished within its budget.
+rerank_cache = TTLCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL_SECONDS, int(QUERY_CACHE_MAX_MB * 2**20))
+answer_cache = SemanticAnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL_SECONDS)
+
+def embed_texts(texts: list[str]):
+    """Embed several texts, serving what it can from the cache and batching the rest."""
+    keys = [normalize_query(text) for text in texts]
+    embeddings = [embedding_cache.get(key) for key in keys]
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if missing:
+        model = embedder.get()
+        # Only remote calls count against the embedding upstream; a local
+        # model's forward passes do not queue behind its limit.
+        limit = EMBEDDING.limit() if model.backend == "remote" else nullcontext()
+        with stage("embed"), limit:
+            fresh = model.embed_many([texts[i] for i in missing])
+        for i, embedding in zip(missing, fresh):
+            embeddings[i] = embedding
+            embedding_cache.set(keys[i], embedding)
+    return embeddings
 
-hf_client = InferenceClient(token=HF_API_KEY)
 
 def embed_text(text: str):
-    embedding = hf_client.feature_extraction(text, model=HF_MODEL)
-    
-    
-    if isinstance(embedding[0], list):
-        embedding = embedding[0]
+    return embed_texts([text])[0]
 
-    
-    embedding = [float(x) for x in embedding]
-    
-    return embedding
 
+system_prompt = PromptTemplate()
 
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(INDEX_NAME)
+
+chunk_store = ChunkStore()
+section_index = SectionIndex()
+lexical_index = BM25Index()
+sessions = open_session_store()
 
 
 class QueryRequest(BaseModel):
     query: str
     conversation_history: list[dict] = []
+    # Server-side conversation to continue; the transcript above is then not
+    # needed. Every response carries the session_id to send next time, or
+    # session_reset if the server no longer has it and wants the transcript.
+    session_id: Optional[str] = None
 
 
 def retrieve_docs(query: str):
+    """Cached retrieval; entries are keyed by index version so a rebuild invalidates them."""
+    key = (index_version.get().current(), normalize_query(query))
+    docs_by_source = retrieval_cache.get(key)
+    if docs_by_source is None:
+        with stage("retrieve"):
+            docs_by_source = search_docs(query)
+        retrieval_cache.set(key, docs_by_source)
+    # The reranker is optional: until the warm-up has loaded it, answer in
+    # retrieval order rather than wait for the model.
+    ranker = reranker.get() if reranker.ready else None
+    if ranker is None:
+        return docs_by_source
+
+    reranked = rerank_cache.get(key)
+    if reranked is None:
+        reranked, complete = rerank_docs(ranker, query, docs_by_source)
+        if complete:
+            rerank_cache.set(key, reranked)
+    return reranked
+
+
+def rerank_docs(ranker, query: str, docs_by_source: dict):
+    """
+    Reorder the best retrieved chunks by cross-encoder score and keep the top
+    RERANK_KEEP. Returns (docs_by_source, complete); on a blown time budget
+    the retrieval order is returned unchanged with complete=False. Exact
+    section lookups are already precise and are left alone.
+    """
+    candidates = [(act, doc) for act, docs in docs_by_source.items() for doc in docs]
+    if not candidates or any(doc.get("exact") for _, doc in candidates):
+        return docs_by_source, True
+
+    candidates.sort(key=lambda candidate: candidate[1]["score"], reverse=True)
+    candidates = candidates[:RERANK_CANDIDATES]
+    with stage("rerank"):
+        scores = ranker.score(query, [doc["text"] for _, doc in candidates])
+    if scores is None:
+        # Busy or over budget; counted in the reranker's stats on /metrics.
+        return docs_by_source, False
+
+    ranked = sorted(zip(scores, candidates), key=lambda item: item[0], reverse=True)[:RERANK_KEEP]
+    reranked = {act: [] for act in docs_by_source}
+    for score, (act, doc) in ranked:
+        reranked[act].append({**doc, "score": score})
+    return reranked, True
+
+
+def lookup_section_docs(query: str):
+    """Chunks for a "section N" query from the exact section index, bucketed by act."""
+    ids_by_act = section_index.lookup(query)
+    if not ids_by_act:
+        return None
+
+    metadata_by_id = chunk_store.metadata(index.get(), [i for ids in ids_by_act.values() for i in ids])
+    docs_by_source = {"BNS": [], "BNSS": [], "BSA": []}
+    for act, ids in ids_by_act.items():
+        for chunk_id in ids:
+            metadata = metadata_by_id.get(chunk_id)
+            if metadata and act in docs_by_source:
+                docs_by_source[act].append({"text": metadata["text"], "score": 1.0, "exact": True})
+
+    return docs_by_source if any(docs_by_source.values()) else None
+
+
+def search_docs(query: str):
     import re
     
+    with stage("section_lookup"):
+        exact_docs = lookup_section_docs(query)
+    if exact_docs:
+        return exact_docs
     
     section_match = re.search(r'section\s+(\d+)', query.lower())
     
@@ -80,24 +273,45 @@ def retrieve_docs(query: str):
             f"section {section_num} provisions penalties procedure evidence"
         ]
         
-        all_matches = []
-        seen_ids = set()
+        fanout_start = time.perf_counter()
+        with stage("section_fanout.embed"):
+            query_vectors = embed_texts(queries)
         
+        def timed_query(position: int, query_vector):
+            with stage(f"section_fanout.query_{position}"), INDEX.limit():
+                # Text comes from the local chunk store or vector store when there is one.
+                return index.get().query(
+                    vector=query_vector,
+                    top_k=200,  
+                    include_metadata=not chunk_store.serves(index.get())
+                )
         
-        for search_query in queries:
-            query_vector = embed_text(search_query)
-            results = index.query(
-                vector=query_vector,
-                top_k=200,  
-                include_metadata=True
-            )
-            
-            for match in results["matches"]:
-                if match["id"] not in seen_ids:
-                    seen_ids.add(match["id"])
-                    all_matches.append(match)
+        # The three searches go out together; results are merged as each one
+        # lands, keeping the best score per chunk.
+        best_matches = {}
+        with stage("section_fanout.queries"):
+            futures = [
+                fanout_executor.submit(copy_context().run, timed_query, position, query_vector)
+                for position, query_vector in enumerate(query_vectors, 1)
+            ]
+            for future in as_completed(futures):
+                for match in future.result()["matches"]:
+                    best = best_matches.get(match["id"])
+                    if best is None or match["score"] > best["score"]:
+                        best_matches[match["id"]] = match
         
+        all_matches = sorted(best_matches.values(), key=lambda match: match["score"], reverse=True)
+        if chunk_store.serves(index.get()):
+            with stage("section_fanout.chunk_metadata"):
+                metadata_by_id = chunk_store.metadata(index.get(), [match["id"] for match in all_matches])
+            all_matches = [
+                {"id": match["id"], "score": match["score"], "metadata": metadata_by_id[match["id"]]}
+                for match in all_matches
+                if match["id"] in metadata_by_id
+            ]
         
+        
+        filter_start = time.perf_counter()
         filtered_matches = []
         
         for match in all_matches:
@@ -139,15 +353,12 @@ def retrieve_docs(query: str):
         
         
         results_to_use = filtered_matches if filtered_matches else all_matches[:50]
+        record("section_fanout.filter", time.perf_counter() - filter_start)
         
-    else:
+        record("section_fanout.total", time.perf_counter() - fanout_start)
         
-        query_vector = embed_text(query)
-        results_to_use = index.query(
-            vector=query_vector,
-            top_k=50,
-            include_metadata=True
-        )["matches"]
+    else:
+        results_to_use = hybrid_search(query)
 
     
     docs_by_source = {
@@ -170,102 +381,436 @@ def retrieve_docs(query: str):
     return docs_by_source
 
 
-def rag_chat(query: str, conversation_history: list[dict] = None):
+def search_act(query_vector, act: str):
+    with stage(f"vector_search.{act}"), INDEX.limit():
+        return index.get().query(
+            vector=query_vector,
+            top_k=PER_ACT_TOP_K,
+            filter={"source": {"$eq": act}},
+            include_metadata=False
+        )["matches"]
+
+
+def hybrid_search(query: str):
+    """
+    Search each act on its own, concurrently, so one act cannot crowd out
+    the others. Vector matches come back as IDs only and are fused with that
+    act's BM25 hits by reciprocal rank; text is then read from the local
+    chunk store for the fused results alone.
+    """
+    query_vector = embed_text(query)
+    with stage("vector_search"):
+        futures = {
+            act: fanout_executor.submit(copy_context().run, search_act, query_vector, act)
+            for act in ACTS
+        }
+        vector_ids = {act: [match["id"] for match in future.result()] for act, future in futures.items()}
+
+    fused = []
+    with stage("lexical_search"):
+        for act in ACTS:
+            rankings = [vector_ids[act]]
+            if len(lexical_index):
+                rankings.append([chunk_id for chunk_id, _, _ in lexical_index.search(query, LEXICAL_TOP_K, source=act)])
+            fused.extend(reciprocal_rank_fusion(rankings, k=RRF_K)[:PER_ACT_RESULTS])
+
+    with stage("chunk_metadata"):
+        metadata_by_id = chunk_store.metadata(index.get(), [chunk_id for chunk_id, _ in fused])
+
+    return [
+        {"id": chunk_id, "score": score, "metadata": metadata_by_id[chunk_id]}
+        for chunk_id, score in fused
+        if chunk_id in metadata_by_id
+    ]
+
+
+def build_prompt(query: str, conversation_history: list[dict] = None, summary: list[str] = None):
+    """Return (prompt, sources, grounding); grounding identifies everything but the question."""
     docs_by_source = retrieve_docs(query)
     
+    with stage("context_pack"):
+        context, used_docs = pack_context(docs_by_source)
     
-    query_lower = query.lower()
-    is_scenario = any(indicator in query_lower for indicator in [
-        'if', 'can i', 'what happens', 'should i', 'is it legal', 'do i have to',
-        'someone', 'a person', 'what if', 'suppose', 'scenario', 'case', 'situation'
-    ])
-    
-    
-    chunk_limit = 15 if is_scenario else 10
-    
-    
-    context_parts = []
-    
-    
-    if docs_by_source["BNS"]:
-        bns_texts = [doc["text"] for doc in docs_by_source["BNS"][:chunk_limit]]
-        context_parts.append("=== BNS (Bharatiya Nyaya Sanhita - Substantive Criminal Law) ===")
-        context_parts.append("\n\n".join(bns_texts))
+    with stage("prompt_render"):
+        prompt = render_prompt(system_prompt, context, query, conversation_history, summary)
     
-    
-    if docs_by_source["BNSS"]:
-        bnss_texts = [doc["text"] for doc in docs_by_source["BNSS"][:chunk_limit]]
-        context_parts.append("\n\n=== BNSS (Bharatiya Nagarik Suraksha Sanhita - Criminal Procedure) ===")
-        context_parts.append("\n\n".join(bnss_texts))
-    
-    
-    if docs_by_source["BSA"]:
-        bsa_texts = [doc["text"] for doc in docs_by_source["BSA"][:chunk_limit]]
-        context_parts.append("\n\n=== BSA (Bharatiya Sakshya Adhiniyam - Evidence Law) ===")
-        context_parts.append("\n\n".join(bsa_texts))
-    
-    context = "\n\n".join(context_parts)
-    
-    
-    with open("system_prompt.txt", "r", encoding="utf-8") as f:
-        prompt_template = f.read()
-    
-    
-    conversation_context = ""
-    if conversation_history:
-        conversation_context = "\n\n=== PREVIOUS CONVERSATION ===\n"
-        for msg in conversation_history[-16:]:  
-            role = msg.get("role", "user")
-            content = msg.get("content", "")
-            if role == "user":
-                conversation_context += f"User: {content}\n"
-            elif role == "assistant":
-                conversation_context += f"Assistant: {content}\n"
-        conversation_context += "\n=== END OF PREVIOUS CONVERSATION ===\n\n"
-    
-    
-    prompt = prompt_template.format(context=context, query=query)
-    
-    
-    if conversation_context:
-        prompt = prompt.replace("{query}", f"{conversation_context}Current Question: {{query}}")
-        prompt = prompt.format(query=query)
-    
-    
-    response = llm.invoke(prompt)
+    sources = [
+        {"act": act, "score": doc["score"], "excerpt": doc["text"][:SOURCE_EXCERPT_CHARS]}
+        for act, doc in used_docs
+    ]
+    conversation = format_conversation(conversation_history or [], summary) if conversation_history or summary else ""
+    grounding = context_key(context, conversation)
+    return prompt, sources, grounding
+
+
+def prepare_answer(query: str, session: dict):
+    """
+    Build the prompt and look for a stored answer to a paraphrase of the same
+    question over the same context. Returns (prompt, sources, cached_answer,
+    store), where store(answer) records a freshly generated answer.
+    """
+    prompt, sources, grounding = build_prompt(query, session["messages"], session["summary"])
+    with stage("answer_cache"):
+        embedding = embed_text(query)
+        generation = (index_version.get().current(), system_prompt.version)
+        cached_answer = answer_cache.get(embedding, grounding, generation)
+    store = partial(answer_cache.set, embedding, grounding, generation)
+    return prompt, sources, cached_answer, store
+
+
+def load_session(session_id: str = None, conversation_history: list[dict] = None):
+    """
+    The stored session, or a new one seeded from the client's transcript.
+    None when the session is unknown (expired, evicted, lost in a restart or
+    held by another worker) and no transcript came with it: the caller then
+    answers session_reset so the client resends the conversation, rather
+    than carrying on without it.
+    """
+    session = sessions.load(session_id) if session_id else None
+    if session is not None:
+        return session
+    if session_id and not conversation_history:
+        return None
+    return new_session(conversation_history)
+
+
+def save_turn(session: dict, query: str, answer: str):
+    add_turn(session, query, answer)
+    sessions.save(session)
+
+
+def observe_tokens(prompt: str, answer: str, response=None):
+    """Token counts of one LLM call: Gemini's own usage when reported, else estimated."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    prompt_tokens.observe(usage.get("input_tokens") or estimate_tokens(prompt))
+    response_tokens.observe(usage.get("output_tokens") or estimate_tokens(answer))
+
+
+def observe_request(endpoint: str, outcome: str, started: float, timings: dict = None):
+    request_seconds.observe(time.perf_counter() - started, endpoint)
+    requests_total.inc(endpoint, outcome)
+    for name, seconds in (timings or {}).items():
+        stage_seconds.observe(seconds, name)
+
+
+async def arag_chat(query: str, session: dict):
+    prompt, _, cached_answer, store = await run_blocking(prepare_answer, query, session)
+    if cached_answer is not None:
+        return cached_answer
+    model = await llm.aget()
+    with stage("llm"):
+        async with LLM.alimit():
+            response = await model.ainvoke(prompt)
+    observe_tokens(prompt, response.content, response)
+    store(response.content)
     return response.content
 
 
+def chunk_text(chunk):
+    """Text of a streamed message chunk; Gemini may send a list of content blocks."""
+    if isinstance(chunk.content, str):
+        return chunk.content
+    return "".join(
+        block if isinstance(block, str) else block.get("text", "")
+        for block in chunk.content
+    )
+
+
+def sse_event(event: str, data: dict):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def busy_response(reason: str):
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": "1"},
+        content={"response": "The server is busy right now. Please try again shortly.", "error": True, "details": reason}
+    )
+
+
 @app.post("/chat")
-async def chat(request: QueryRequest):
+async def chat(request: QueryRequest, response: Response):
+    started = time.perf_counter()
+    timings = None
+    outcome = "error"
     try:
         if not request.query or request.query.strip() == "":
+            outcome = "invalid"
             return {"response": "Please provide a valid question.", "error": True}
         
-        answer = rag_chat(request.query, request.conversation_history)
-        return {"response": answer, "error": False}
+        timings = begin_request()
+        async with admission.slot():
+            with stage("session"):
+                session = await run_blocking(load_session, request.session_id, request.conversation_history)
+            if session is None:
+                outcome = "session_reset"
+                return {"response": "", "error": False, "session_reset": True}
+            answer = await arag_chat(request.query, session)
+            with stage("session"):
+                await run_blocking(save_turn, session, request.query, answer)
+        outcome = "ok"
+        if EXPOSE_TIMINGS:
+            response.headers["Server-Timing"] = server_timing(timings)
+        return {"response": answer, "error": False, "session_id": session["id"]}
+    except Saturated as e:
+        outcome = "busy"
+        return busy_response(str(e))
     except Exception as e:
         return {"response": f"An error occurred while processing your request. Please try again.", "error": True, "details": str(e)}
+    finally:
+        observe_request("chat", outcome, started, timings)
+
+@app.post("/chat/stream")
+async def chat_stream(request: QueryRequest, http_request: Request):
+    """
+    Stream the answer as server-sent events: one "sources" event with the
+    retrieved chunks, then "token" events as Gemini generates, then "done"
+    (or "error"). A lone "session_reset" event asks for the request again
+    with the transcript. If the client goes away, the upstream generation is
+    cancelled instead of running to completion.
+    """
+    started = time.perf_counter()
+    if not request.query or request.query.strip() == "":
+        observe_request("chat_stream", "invalid", started)
+        return {"response": "Please provide a valid question.", "error": True}
+
+    try:
+        await admission.acquire()
+    except Saturated as e:
+        observe_request("chat_stream", "busy", started)
+        return busy_response(str(e))
+
+    released = False
+
+    def release_slot():
+        nonlocal released
+        if not released:
+            released = True
+            admission.release()
+
+    def done_event(session: dict):
+        data = {"session_id": session["id"]}
+        if EXPOSE_TIMINGS:
+            data["timings"] = {name: round(seconds * 1000, 1) for name, seconds in timings.items()}
+        return sse_event("done", data)
+
+    timings = {}
+
+    async def events():
+        nonlocal timings
+        stream = None
+        outcome = "error"
+        timings = begin_request()
+        try:
+            with stage("session"):
+                session = await run_blocking(load_session, request.session_id, request.conversation_history)
+            if session is None:
+                outcome = "session_reset"
+                yield sse_event("session_reset", {})
+                return
+            prompt, sources, cached_answer, store = await run_blocking(prepare_answer, request.query, session)
+            yield sse_event("sources", {"sources": sources, "session_id": session["id"]})
+
+            if cached_answer is not None:
+                with stage("session"):
+                    await run_blocking(save_turn, session, request.query, cached_answer)
+                outcome = "ok"
+                yield sse_event("token", {"text": cached_answer})
+                yield done_event(session)
+                return
+
+            parts = []
+            llm_started = time.perf_counter()
+            stream = (await llm.aget()).astream(prompt)
+            # The upstream slot is held until the stream ends, not just until it starts.
+            async with LLM.alimit():
+                async for chunk in stream:
+                    if await http_request.is_disconnected():
+                        outcome = "disconnected"
+                        break
+                    text = chunk_text(chunk)
+                    if text:
+                        if not parts:
+                            record("llm_first_token", time.perf_counter() - llm_started)
+                        parts.append(text)
+                        yield sse_event("token", {"text": text})
+            if outcome != "disconnected":
+                record("llm", time.perf_counter() - llm_started)
+                # Only a complete answer is worth serving again or remembering.
+                answer = "".join(parts)
+                observe_tokens(prompt, answer)
+                store(answer)
+                with stage("session"):
+                    await run_blocking(save_turn, session, request.query, answer)
+                outcome = "ok"
+                yield done_event(session)
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception as e:
+            yield sse_event("error", {"response": "An error occurred while processing your request. Please try again.", "details": str(e)})
+        finally:
+            if stream is not None:
+                # Closing the generator aborts the upstream HTTP stream.
+                await stream.aclose()
+            release_slot()
+            observe_request("chat_stream", outcome, started, timings)
+
+    # The background task covers a response that fails before the generator starts.
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release_slot)
+    )
+
 
 @app.get("/")
 async def home():
     return {"message": "LawGPT API running successfully!", "status": "active", "version": "1.0"}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text-format metrics: stage and request histograms, caches, admission and tokens."""
+    caches = {
+        "embedding": embedding_cache.stats(),
+        "retrieval": retrieval_cache.stats(),
+        "rerank": rerank_cache.stats(),
+        "answer": answer_cache.stats()
+    }
+    admission_stats = admission.stats()
+    lines = []
+    for metric in (stage_seconds, request_seconds, requests_total, prompt_tokens, response_tokens,
+                   upstream_seconds, upstream_wait_seconds):
+        lines.extend(metric.render())
+    lines.extend(render_samples(
+        "lawgpt_cache_hits_total", "counter", "Cache lookups that hit.",
+        [((name,), stats["hits"]) for name, stats in caches.items()], ("cache",)
+    ))
+    lines.extend(render_samples(
+        "lawgpt_cache_misses_total", "counter", "Cache lookups that missed.",
+        [((name,), stats["misses"]) for name, stats in caches.items()], ("cache",)
+    ))
+    lines.extend(render_samples(
+        "lawgpt_cache_hit_ratio", "gauge", "Hits over lookups since start.",
+        [((name,), stats["hit_rate"]) for name, stats in caches.items()], ("cache",)
+    ))
+    lines.extend(render_samples(
+        "lawgpt_cache_entries", "gauge", "Entries currently cached.",
+        [((name,), stats["entries"]) for name, stats in caches.items()], ("cache",)
+    ))
+    lines.extend(render_samples(
+        "lawgpt_requests_in_flight", "gauge", "Requests currently generating an answer.",
+        [((), admission_stats["in_flight"])]
+    ))
+    lines.extend(render_samples(
+        "lawgpt_requests_queued", "gauge", "Requests waiting for a slot.",
+        [((), admission_stats["queued"])]
+    ))
+    lines.extend(render_samples(
+        "lawgpt_requests_rejected_total", "counter", "Requests turned away with a 503.",
+        [((), admission_stats["rejected"])]
+    ))
+    upstream_stats = {upstream.name: upstream.stats() for upstream in UPSTREAMS}
+    lines.extend(render_samples(
+        "lawgpt_upstream_calls_total", "counter", "Upstream calls by outcome.",
+        [((name, outcome), count) for name, stats in upstream_stats.items() for outcome, count in sorted(stats["calls"].items())],
+        ("upstream", "outcome")
+    ))
+    for field, help in (
+        ("in_flight", "Upstream calls in progress."),
+        ("waiting", "Calls waiting for a free upstream slot."),
+        ("max_concurrency", "Configured limit on concurrent upstream calls."),
+        ("max_connections", "Configured size of the upstream connection pool.")
+    ):
+        lines.extend(render_samples(
+            f"lawgpt_upstream_{field}", "gauge", help,
+            [((name,), stats[field]) for name, stats in upstream_stats.items()], ("upstream",)
+        ))
+    ranker = reranker.get() if reranker.ready else None
+    if ranker is not None:
+        rerank_stats = ranker.stats()
+        lines.extend(render_samples(
+            "lawgpt_rerank_total", "counter",
+            "Rerank attempts by outcome: completed, timeout (over budget) or skipped (all slots busy).",
+            [((outcome,), rerank_stats[field])
+             for outcome, field in (("completed", "completed"), ("timeout", "timeouts"), ("skipped", "skipped"))],
+            ("outcome",)
+        ))
+    startup_stats = startup.stats()
+    lines.extend(render_samples(
+        "lawgpt_startup_seconds", "gauge", "Time from process start to import done and to ready.",
+        [((phase,), startup_stats[f"{phase}_ms"] / 1000)
+         for phase in ("import", "ready") if startup_stats[f"{phase}_ms"] is not None], ("phase",)
+    ))
+    lines.extend(render_samples(
+        "lawgpt_resource_ready", "gauge", "1 once an upstream client or model is built.",
+        [((name,), int(stats["ready"])) for name, stats in startup_stats["resources"].items()], ("resource",)
+    ))
+    lines.extend(render_samples(
+        "lawgpt_resource_init_seconds", "gauge", "Time taken to build each upstream client or model.",
+        [((name,), stats["init_ms"] / 1000)
+         for name, stats in startup_stats["resources"].items() if stats["init_ms"] is not None], ("resource",)
+    ))
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+
+def blocking_health_stats():
+    """The /health fields that need an index round trip or a session store query."""
+    # Resources still warming up are reported as None rather than built here.
+    total_vectors = None
+    if index.ready:
+        with INDEX.limit():
+            total_vectors = vector_count(index.get())
+    return {
+        "total_vectors": total_vectors,
+        "index_version": index_version.get().current() if index_version.ready else None,
+        "sessions": sessions.stats()
+    }
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint to verify API is running"""
     try:
-        
-        stats = index.describe_index_stats()
+        blocking_stats = await run_blocking(blocking_health_stats)
         return {
-            "status": "healthy",
-            "pinecone_connected": True,
-            "total_vectors": stats.total_vector_count,
+            "status": "healthy" if startup.ready else "starting",
+            "vector_backend": VECTOR_BACKEND,
+            "pinecone_connected": VECTOR_BACKEND == "pinecone" and index.ready,
+            "total_vectors": blocking_stats["total_vectors"],
+            "index_version": blocking_stats["index_version"],
+            "embedding_cache": embedding_cache.stats(),
+            "retrieval_cache": retrieval_cache.stats(),
+            "answer_cache": answer_cache.stats(),
+            "sessions": blocking_stats["sessions"],
+            "bm25_chunks": len(lexical_index),
+            "chunk_store_chunks": len(chunk_store),
+            "admission": admission.stats(),
+            "upstreams": {upstream.name: upstream.stats() for upstream in UPSTREAMS},
+            "context_token_budget": CONTEXT_TOKEN_BUDGET,
             "model": "gemini-2.5-flash",
-            "embedding_model": HF_MODEL
+            "embedding_model": EMBEDDING_MODEL,
+            "embedding_backend": embedder.get().backend if embedder.ready else None,
+            "reranker": reranker.get().stats() if reranker.ready and reranker.get() is not None else None,
+            "startup": startup.stats()
         }
     except Exception as e:
         return {
             "status": "unhealthy",
             "error": str(e)
-        }
\ No newline at end of file
+        }
+
+
+@app.get("/health/live")
+async def liveness():
+    """The process is up and serving; never touches an upstream."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """200 once every required client is built, 503 until then; route traffic on this."""
+    stats = startup.stats()
+    return JSONResponse(status_code=200 if stats["ready"] else 503, content=stats)
+
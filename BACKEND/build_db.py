@@ -1,133 +1,725 @@
+import argparse
+import hashlib
+import json
 import os
+import random
 import time
+import tracemalloc
+from collections import Counter
+from types import SimpleNamespace
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from dotenv import load_dotenv
-from pinecone import Pinecone, ServerlessSpec
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
+from sections import SectionIndexBuilder
+from lexical import BM25IndexBuilder
+from vector_store import (
+    CHUNK_STORE_DIR, EMBEDDING_DIMENSION, INDEX_NAME, VECTOR_BACKEND,
+    ArtifactWriter, corpus_version, open_index, publish_index_version, vector_count
+)
 
 load_dotenv()
 
 
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "lawgpt")
-EMBEDDING_DIMENSION = 384  
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 
+# Chunks per forward pass, and number of CPU worker processes for embedding.
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))
+# Chunks held in memory per embedding step (0 = derive from batch size and workers).
+EMBED_WINDOW = int(os.getenv("EMBED_WINDOW", "0"))
 
-pc = Pinecone(api_key=PINECONE_API_KEY)
+# PDF page extraction workers and the page-text cache (keyed by file hash + page).
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+PAGE_CACHE_DIR = os.getenv("PAGE_CACHE_DIR", os.path.join(".cache", "pages"))
 
 
-existing_indexes = pc.list_indexes().names()
-if INDEX_NAME in existing_indexes:
-    
-    index_info = pc.describe_index(INDEX_NAME)
-    if index_info.dimension != EMBEDDING_DIMENSION:
-        print(f"Deleting existing index with dimension {index_info.dimension}...")
-        pc.delete_index(INDEX_NAME)
-        print("Index deleted. Creating new index with correct dimension...")
-        time.sleep(5)  
-        existing_indexes = []
+DATA_DIR = "books"
 
-if INDEX_NAME not in existing_indexes:
-    print(f"Creating new Pinecone index with dimension {EMBEDDING_DIMENSION}...")
-    pc.create_index(
-        name=INDEX_NAME,
-        dimension=EMBEDDING_DIMENSION,
-        metric="cosine",
-        spec=ServerlessSpec(
-            cloud="aws",
-            region="us-east-1"
-        )
-    )
-    print("Index created successfully!")
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1500"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "300"))
 
-index = pc.Index(INDEX_NAME)
 
+BOOK_MAPPING = {
+    "250882_english_01042024_0.pdf": "BSA",
+    "250883_english_01042024.pdf": "BNS",
+    "250884_2_english_01042024.pdf": "BNSS"
+}
 
-DATA_DIR = "books"
+# Upserts are batched by request size (chunk text makes metadata large) and
+# sent on UPSERT_CONCURRENCY threads; failed batches are retried with backoff.
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+UPSERT_MAX_BYTES = int(os.getenv("UPSERT_MAX_BYTES", str(1_500_000)))
+UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", "4"))
+UPSERT_RETRIES = int(os.getenv("UPSERT_RETRIES", "5"))
+DELETE_BATCH_SIZE = 1000
 
+# "diff" embeds and upserts only chunks missing from the manifest and deletes
+# chunks that disappeared; "full" clears the index and re-uploads everything.
+BUILD_MODE = os.getenv("BUILD_MODE", "diff")
+MANIFEST_PATH = os.getenv("MANIFEST_PATH", "index_manifest.json")
 
-BOOK_MAPPING = {
-    "250882_english_01042024_0.pdf": "BSA",   
-    "250883_english_01042024.pdf": "BNS",     
-    "250884_2_english_01042024.pdf": "BNSS"   
-}
 
-books_with_metadata = []
+def file_sha256(file_path: str):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-for file in os.listdir(DATA_DIR):
-    file_path = os.path.join(DATA_DIR, file)
-    book_source = BOOK_MAPPING.get(file, "UNKNOWN")
 
-    if file.endswith(".txt") or file.endswith(".md"):
-        with open(file_path, "r", encoding="utf-8") as f:
-            text = f.read()
-            books_with_metadata.append({"text": text, "source": book_source})
+def _cached_page_path(file_hash: str, page_num: int):
+    return os.path.join(PAGE_CACHE_DIR, file_hash, f"{page_num:05d}.txt")
 
-    elif file.endswith(".pdf"):
-        import pdfplumber
-        with pdfplumber.open(file_path) as pdf:
-            text = "\n".join(page.extract_text() or "" for page in pdf.pages)
-            books_with_metadata.append({"text": text, "source": book_source})
 
+def _write_cache_file(path: str, text: str):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
 
-splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1500,  
-    chunk_overlap=300  
-)
 
+# Open PDF handles in the current extraction worker, keyed by path.
+_open_pdfs = {}
+
+
+def _extract_page(args):
+    """Extract one PDF page in a worker, reusing the page cache if present."""
+    file_path, file_hash, page_num = args
+    cache_path = _cached_page_path(file_hash, page_num)
+    if os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    import pdfplumber
+    pdf = _open_pdfs.get(file_path)
+    if pdf is None:
+        pdf = _open_pdfs[file_path] = pdfplumber.open(file_path)
+
+    page = pdf.pages[page_num]
+    text = page.extract_text() or ""
+    # Drop pdfplumber's parsed layout objects for this page.
+    page.close()
+
+    _write_cache_file(cache_path, text)
+    return text
+
+
+def iter_pdf_pages(file_path: str, pool, workers: int = EXTRACT_WORKERS):
+    """
+    Yield PDF page texts in order. Pages come from the on-disk cache when the
+    file (by content hash) was extracted before, otherwise they are extracted
+    on the process pool a window at a time.
+    """
+    file_hash = file_sha256(file_path)
+    meta_path = os.path.join(PAGE_CACHE_DIR, file_hash, "pages.json")
+
+    if os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            page_count = json.load(f)["page_count"]
+        for page_num in range(page_count):
+            with open(_cached_page_path(file_hash, page_num), "r", encoding="utf-8") as f:
+                yield f.read()
+        return
+
+    import pdfplumber
+    with pdfplumber.open(file_path) as pdf:
+        page_count = len(pdf.pages)
+
+    window_size = max(workers, 1) * 8
+    for window in batched(range(page_count), window_size):
+        tasks = [(file_path, file_hash, page_num) for page_num in window]
+        yield from pool.map(_extract_page, tasks)
 
-all_chunks = []
-for book_data in books_with_metadata:
-    book_chunks = splitter.split_text(book_data["text"])
-    for chunk in book_chunks:
-        all_chunks.append({
+    _write_cache_file(meta_path, json.dumps({"page_count": page_count}))
+
+
+def split_pages(pages, splitter):
+    """
+    Split a stream of page texts into chunks without joining the whole book.
+    The last chunk of each step is carried into the next page so chunks can
+    still span page boundaries.
+    """
+    carry = ""
+    for page_text in pages:
+        buffer = f"{carry}\n{page_text}" if carry else page_text
+        chunks = splitter.split_text(buffer)
+        if not chunks:
+            continue
+        yield from chunks[:-1]
+        carry = chunks[-1]
+
+    if carry:
+        yield carry
+
+
+def chunk_id(source: str, text: str):
+    """Deterministic vector ID derived from the chunk's act and content."""
+    digest = hashlib.sha256(f"{source}\0{text}".encode("utf-8")).hexdigest()
+    return f"{source}-{digest[:32]}"
+
+
+def iter_documents(data_dir: str, pool, workers: int = EXTRACT_WORKERS):
+    """Yield (file name, act, page texts) for every book in data_dir, in name order."""
+    for file in sorted(os.listdir(data_dir)):
+        file_path = os.path.join(data_dir, file)
+        book_source = BOOK_MAPPING.get(file, "UNKNOWN")
+
+        if file.endswith(".txt") or file.endswith(".md"):
+            with open(file_path, "r", encoding="utf-8") as f:
+                pages = [f.read()]
+        elif file.endswith(".pdf"):
+            pages = iter_pdf_pages(file_path, pool, workers)
+        else:
+            continue
+
+        yield file, book_source, pages
+
+
+def make_splitter(chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap
+    )
+
+
+def make_chunks(source: str, pages, splitter):
+    for chunk in split_pages(pages, splitter):
+        yield {
+            "id": chunk_id(source, chunk),
             "text": chunk,
-            "source": book_data["source"]
-        })
+            "source": source
+        }
 
-print(f"Total Chunks: {len(all_chunks)}")
-print(f"BNS Chunks: {sum(1 for c in all_chunks if c['source'] == 'BNS')}")
-print(f"BNSS Chunks: {sum(1 for c in all_chunks if c['source'] == 'BNSS')}")
-print(f"BSA Chunks: {sum(1 for c in all_chunks if c['source'] == 'BSA')}")
 
+def iter_chunks(data_dir: str = DATA_DIR, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP,
+                extract_workers: int = EXTRACT_WORKERS):
+    splitter = make_splitter(chunk_size, chunk_overlap)
 
+    with ProcessPoolExecutor(max_workers=max(extract_workers, 1)) as extract_pool:
+        for file, book_source, pages in iter_documents(data_dir, extract_pool, extract_workers):
+            print(f"Reading {file} ({book_source})...")
+            yield from make_chunks(book_source, pages, splitter)
+
+
+def batched(iterable, size: int):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
-print("Loading embedding model...")
-MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
-embedding_model = SentenceTransformer(MODEL_NAME)
-print(f"Model loaded. Embedding dimension: {embedding_model.get_sentence_embedding_dimension()}")
 
-def embed_text(text: str):
+# Model handle for the current process. Worker processes load their own copy
+# in _init_embed_worker so nothing large is pickled across the pool.
+_embedding_model = None
+
+
+def load_embedding_model():
+    global _embedding_model
+    if _embedding_model is None:
+        from sentence_transformers import SentenceTransformer
+        _embedding_model = SentenceTransformer(MODEL_NAME, device="cpu")
+    return _embedding_model
+
+
+def _init_embed_worker(torch_threads: int):
+    import torch
+    torch.set_num_threads(torch_threads)
+    load_embedding_model()
+
+
+def _encode_batch(texts: list[str]):
+    model = load_embedding_model()
+    return model.encode(
+        texts,
+        batch_size=len(texts),
+        convert_to_numpy=True,
+        show_progress_bar=False
+    )
+
+
+def make_length_buckets(texts: list[str], batch_size: int):
     """
-    Get embedding using local sentence-transformers model
-    Returns 1D Python float list for Pinecone
+    Group text indices into batches of similar length so each forward
+    pass pads as little as possible. Longest batches come first.
     """
-    embedding = embedding_model.encode(text, convert_to_numpy=True)
-    return embedding.tolist()
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def open_embed_pool(workers: int = EMBED_WORKERS):
+    """Start CPU worker processes for embedding, or None to embed in-process."""
+    if workers <= 1:
+        return None
+    torch_threads = max(1, (os.cpu_count() or 1) // workers)
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_embed_worker,
+        initargs=(torch_threads,)
+    )
 
 
+def embed_texts(texts: list[str], batch_size: int = EMBED_BATCH_SIZE, pool=None):
+    """
+    Embed texts in length-sorted batches, on the worker pool if one is
+    given. Returns a float32 array in the original text order.
+    """
+    import numpy as np
+
+    embeddings = np.zeros((len(texts), EMBEDDING_DIMENSION), dtype=np.float32)
+    if not texts:
+        return embeddings
+
+    buckets = make_length_buckets(texts, batch_size)
+    batches = [[texts[i] for i in bucket] for bucket in buckets]
+
+    if pool is not None:
+        encoded = pool.map(_encode_batch, batches)
+    else:
+        encoded = map(_encode_batch, batches)
+
+    for bucket, batch_embeddings in zip(buckets, encoded):
+        embeddings[bucket] = batch_embeddings
 
-vectors = []
+    return embeddings
 
-for i, chunk_data in enumerate(all_chunks):
-    if i % 100 == 0:
-        print(f"Processing chunk {i}/{len(all_chunks)}...")
-    vec = embed_text(chunk_data["text"])  
-    vectors.append({
-        "id": f"chunk-{i}",
-        "values": vec,
-        "metadata": {
-            "text": chunk_data["text"],
-            "source": chunk_data["source"]
+
+def embed_chunks(chunks, batch_size: int = EMBED_BATCH_SIZE, workers: int = EMBED_WORKERS):
+    """
+    Embed a stream of chunks a window at a time, yielding (chunk, embedding)
+    pairs. Only one window of chunks and vectors is held in memory; length
+    bucketing happens within each window.
+    """
+    window_size = EMBED_WINDOW or batch_size * max(workers, 1) * 4
+    total = 0
+    embed_seconds = 0.0
+
+    pool = open_embed_pool(workers)
+    try:
+        for window in batched(chunks, window_size):
+            start = time.perf_counter()
+            embeddings = embed_texts([c["text"] for c in window], batch_size, pool)
+            embed_seconds += time.perf_counter() - start
+            total += len(window)
+            print(f"Embedded {total} chunks...")
+            yield from zip(window, embeddings)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    print(f"Embedded {total} chunks in {embed_seconds:.1f}s "
+          f"({total / max(embed_seconds, 1e-9):.1f} chunks/sec)")
+
+
+def chunk_metadata(chunk: dict):
+    metadata = {
+        "text": chunk["text"],
+        "source": chunk["source"]
+    }
+    if chunk.get("sections"):
+        metadata["section"] = chunk["sections"][0]
+    return metadata
+
+
+def iter_vectors(embedded_chunks):
+    for chunk_data, embedding in embedded_chunks:
+        yield {
+            "id": chunk_data["id"],
+            "values": embedding.tolist(),
+            "metadata": chunk_metadata(chunk_data)
         }
-    })
 
-BATCH_SIZE = 100
-total_batches = (len(vectors) + BATCH_SIZE - 1) // BATCH_SIZE
 
-for batch_idx in range(0, len(vectors), BATCH_SIZE):
-    batch = vectors[batch_idx:batch_idx + BATCH_SIZE]
-    index.upsert(batch)
-    print(f"Upserted batch {batch_idx // BATCH_SIZE + 1}/{total_batches} ({len(batch)} vectors)")
+def vector_payload_bytes(vector: dict):
+    """Rough JSON size of a vector in an upsert request."""
+    text_bytes = len(vector["metadata"]["text"].encode("utf-8"))
+    # Floats serialise to roughly 20 characters each.
+    return text_bytes + len(vector["values"]) * 20 + 200
+
+
+def batched_by_bytes(vectors, max_bytes: int = UPSERT_MAX_BYTES, max_count: int = UPSERT_BATCH_SIZE):
+    batch = []
+    batch_bytes = 0
+    for vector in vectors:
+        size = vector_payload_bytes(vector)
+        if batch and (batch_bytes + size > max_bytes or len(batch) == max_count):
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append(vector)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
+class DryRunSink:
+    """
+    Stands in for the vector index in dry runs and profiles: accepts upserts
+    and deletes, keeps nothing, and counts what would have been sent.
+    """
+
+    def __init__(self):
+        self.vectors = 0
+        self.requests = 0
+        self.payload_bytes = 0
+
+    def upsert(self, vectors: list[dict], **kwargs):
+        self.vectors += len(vectors)
+        self.requests += 1
+        self.payload_bytes += sum(vector_payload_bytes(vector) for vector in vectors)
+        return {"upserted_count": len(vectors)}
+
+    def delete(self, **kwargs):
+        return {}
+
+    def fetch(self, ids: list[str], **kwargs):
+        return {"vectors": {}}
+
+    def describe_index_stats(self, **kwargs):
+        return SimpleNamespace(total_vector_count=0, dimension=EMBEDDING_DIMENSION)
+
 
-print("Pinecone DB build completed successfully!")
\ No newline at end of file
+def with_retries(operation, *args, retries: int = UPSERT_RETRIES, **kwargs):
+    """Call operation, retrying with exponential backoff and jitter."""
+    for attempt in range(retries + 1):
+        try:
+            return operation(*args, **kwargs)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = min(30.0, 2 ** attempt) * random.uniform(0.5, 1.0)
+            print(f"Index request failed ({e}); retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+
+def upload_vectors(index, vectors, on_uploaded, concurrency: int = UPSERT_CONCURRENCY):
+    """
+    Upsert vectors with up to `concurrency` batches in flight. on_uploaded is
+    called on this thread for every batch the index accepted, including the
+    ones still in flight when another batch fails, so the caller can
+    checkpoint progress before the error is raised.
+    """
+    in_flight = {}
+
+    def record(done):
+        error = None
+        for future in done:
+            batch = in_flight.pop(future)
+            try:
+                future.result()
+            except Exception as e:
+                error = error or e
+                continue
+            on_uploaded(batch)
+        return error
+
+    error = None
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        try:
+            for batch in batched_by_bytes(vectors):
+                in_flight[pool.submit(with_retries, index.upsert, vectors=batch)] = batch
+                if len(in_flight) >= concurrency:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    error = record(done)
+                    if error:
+                        break
+        finally:
+            # Batches still in flight are recorded even after a failure;
+            # only the first error is raised.
+            done, _ = wait(in_flight)
+            e = record(done)
+            error = error or e
+
+    if error:
+        raise error
+
+
+def load_manifest(path: str = MANIFEST_PATH):
+    """
+    Return {chunk id: source} for vectors already in the index, or None if
+    there is no manifest for this index.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("backend", "pinecone") != VECTOR_BACKEND or manifest.get("index") != INDEX_NAME:
+        return None
+    return manifest["ids"]
+
+
+def save_manifest(ids: dict, path: str = MANIFEST_PATH):
+    _write_cache_file(path, json.dumps({"backend": VECTOR_BACKEND, "index": INDEX_NAME, "ids": ids}))
+
+
+def select_new_chunks(chunks, indexed_ids: dict, seen_ids: set):
+    """
+    Record every chunk ID in seen_ids and pass on only chunks that are not
+    already indexed. Duplicate chunks within a run are passed on once.
+    """
+    for chunk in chunks:
+        if chunk["id"] in seen_ids:
+            continue
+        seen_ids.add(chunk["id"])
+        if chunk["id"] not in indexed_ids:
+            yield chunk
+
+
+def build(args):
+    """
+    Stream the corpus into the index: only chunks missing from the manifest
+    are embedded and upserted (all of them in full mode), and vectors whose
+    chunk disappeared are deleted. A dry run sends everything to a
+    DryRunSink and writes no manifest or index files.
+    """
+    persist = not args.dry_run
+    index = open_index(create=True, pool_threads=args.upsert_concurrency) if persist else DryRunSink()
+
+    indexed_ids = load_manifest() if args.mode == "diff" and persist else None
+    if indexed_ids is not None and VECTOR_BACKEND == "local":
+        # The local store only reaches disk on flush, so it may hold fewer
+        # vectors than an interrupted run checkpointed.
+        indexed_ids = {k: v for k, v in indexed_ids.items() if k in index}
+    existing_count = vector_count(index)
+    if indexed_ids is not None and not existing_count:
+        indexed_ids = None
+    if indexed_ids is None:
+        # Without a usable manifest the existing vectors are unknown, so
+        # start from an empty index rather than leave stale ones behind.
+        if existing_count:
+            print(f"Clearing {existing_count} existing vectors...")
+            index.delete(delete_all=True)
+        indexed_ids = {}
+        if persist:
+            save_manifest(indexed_ids)
+    target = "dry run" if args.dry_run else VECTOR_BACKEND
+    print(f"Build mode: {args.mode}, target: {target} ({len(indexed_ids)} vectors already indexed)")
+
+    if args.embed_workers <= 1:
+        print("Loading embedding model...")
+        embedding_model = load_embedding_model()
+        print(f"Model loaded. Embedding dimension: {embedding_model.get_sentence_embedding_dimension()}")
+
+    print(f"Embedding chunks (batch size {args.embed_batch_size}, workers {args.embed_workers})...")
+    source_counts = Counter()
+    seen_ids = set()
+    section_index = SectionIndexBuilder()
+    lexical_index = BM25IndexBuilder()
+    # Pinecone builds stream chunk text to a local store as it goes by; the
+    # local backend keeps text in its own artifact.
+    chunk_store = ArtifactWriter(CHUNK_STORE_DIR, with_embeddings=False) if persist and VECTOR_BACKEND != "local" else None
+
+    def counted(chunks):
+        for chunk in chunks:
+            source_counts[chunk["source"]] += 1
+            # Every chunk, new or unchanged, goes into the section and BM25
+            # indexes and the local chunk store.
+            chunk["sections"] = section_index.add(chunk)
+            lexical_index.add(chunk)
+            if chunk_store is not None and chunk["id"] not in chunk_store:
+                section = chunk["sections"][0] if chunk["sections"] else -1
+                chunk_store.add(chunk["id"], chunk["text"].encode("utf-8"), chunk["source"], section)
+            yield chunk
+
+    chunks = iter_chunks(args.data_dir, args.chunk_size, args.chunk_overlap, args.extract_workers)
+    new_chunks = select_new_chunks(counted(chunks), indexed_ids, seen_ids)
+    vectors = iter_vectors(embed_chunks(new_chunks, args.embed_batch_size, args.embed_workers))
+
+    upserted = 0
+
+    def checkpoint(batch):
+        nonlocal upserted
+        for vector in batch:
+            indexed_ids[vector["id"]] = vector["metadata"]["source"]
+        if persist:
+            save_manifest(indexed_ids)
+        upserted += len(batch)
+        print(f"Upserted {len(batch)} vectors ({upserted} total)")
+
+    upload_vectors(index, vectors, checkpoint, args.upsert_concurrency)
+
+    removed_ids = [vector_id for vector_id in indexed_ids if vector_id not in seen_ids]
+    for batch in batched(removed_ids, DELETE_BATCH_SIZE):
+        with_retries(index.delete, ids=batch)
+        for vector_id in batch:
+            del indexed_ids[vector_id]
+        save_manifest(indexed_ids)
+    if removed_ids:
+        print(f"Deleted {len(removed_ids)} stale vectors")
+
+    if persist:
+        if hasattr(index, "flush"):
+            index.flush()
+        section_index.save()
+        lexical_index.save()
+        if chunk_store is not None:
+            chunk_store.finish()
+        # Lets running servers notice the rebuild and drop cached results.
+        with_retries(publish_index_version, index, corpus_version(indexed_ids))
+
+    print(f"Total Chunks: {sum(source_counts.values())}")
+    print(f"BNS Chunks: {source_counts['BNS']}")
+    print(f"BNSS Chunks: {source_counts['BNSS']}")
+    print(f"BSA Chunks: {source_counts['BSA']}")
+    print(f"New Chunks: {upserted}, unchanged: {len(seen_ids) - upserted}, removed: {len(removed_ids)}")
+
+    if args.dry_run:
+        print(f"Dry run: {index.requests} upsert requests, {index.payload_bytes / 2**20:.1f} MB of payload, nothing written")
+    else:
+        print(f"Vector DB build ({VECTOR_BACKEND}) completed successfully!")
+
+
+def peak_rss_mb():
+    """High-water resident memory of this process in MB, or None where unsupported."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    import sys
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KB elsewhere.
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+class StageProfiler:
+    """Wall time, throughput and peak memory of each build stage, run one after another."""
+
+    def __init__(self):
+        self.stages = []
+
+    def run(self, name: str, unit: str, func, *args):
+        """Run func(*args), which returns (result, item count), and record the stage."""
+        tracemalloc.start()
+        start = time.perf_counter()
+        result, items = func(*args)
+        seconds = time.perf_counter() - start
+        _, python_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        stage = {
+            "stage": name,
+            "seconds": seconds,
+            "items": items,
+            "unit": unit,
+            "items_per_second": items / seconds if seconds else None,
+            "python_peak_mb": python_peak / 2**20,
+            "process_peak_rss_mb": peak_rss_mb()
+        }
+        self.stages.append(stage)
+        print(f"{name:<8} {seconds:8.2f} s  {items:>7} {unit:<8} "
+              f"{stage['items_per_second'] or 0:9.1f} {unit}/s  "
+              f"python peak {stage['python_peak_mb']:7.1f} MB")
+        return result
+
+
+def profile_build(args):
+    """
+    Run extract, chunk, embed and upload one after another against a
+    DryRunSink, so each stage's time and memory can be measured on its own
+    and configurations can be compared on the same corpus. Page texts come
+    from the page cache when present; clear it to measure extraction itself.
+    Python peak memory comes from tracemalloc (which slows Python-heavy
+    stages somewhat) and excludes worker processes and torch tensors.
+    """
+    profiler = StageProfiler()
+    sink = DryRunSink()
+
+    def extract():
+        with ProcessPoolExecutor(max_workers=max(args.extract_workers, 1)) as pool:
+            documents = [
+                (file, source, list(pages))
+                for file, source, pages in iter_documents(args.data_dir, pool, args.extract_workers)
+            ]
+        return documents, sum(len(pages) for _, _, pages in documents)
+
+    def chunk(documents):
+        splitter = make_splitter(args.chunk_size, args.chunk_overlap)
+        seen_ids = set()
+        chunks = [
+            chunk
+            for _, source, pages in documents
+            for chunk in select_new_chunks(make_chunks(source, pages, splitter), {}, seen_ids)
+        ]
+        return chunks, len(chunks)
+
+    def embed(chunks):
+        if args.embed_workers <= 1:
+            load_embedding_model()
+        embedded = list(embed_chunks(chunks, args.embed_batch_size, args.embed_workers))
+        return embedded, len(embedded)
+
+    def upload(embedded):
+        upload_vectors(sink, iter_vectors(embedded), lambda batch: None, args.upsert_concurrency)
+        return None, sink.vectors
+
+    print(f"Profiling build of {args.data_dir} (chunk size {args.chunk_size}, overlap {args.chunk_overlap}, "
+          f"batch size {args.embed_batch_size}, embed workers {args.embed_workers})")
+    documents = profiler.run("extract", "pages", extract)
+    chunks = profiler.run("chunk", "chunks", chunk, documents)
+    embedded = profiler.run("embed", "chunks", embed, chunks)
+    profiler.run("upload", "vectors", upload, embedded)
+
+    report = {
+        "config": {
+            "data_dir": args.data_dir,
+            "files": {
+                file: file_sha256(os.path.join(args.data_dir, file))
+                for file, _, _ in documents
+            },
+            "chunk_size": args.chunk_size,
+            "chunk_overlap": args.chunk_overlap,
+            "embed_batch_size": args.embed_batch_size,
+            "embed_workers": args.embed_workers,
+            "extract_workers": args.extract_workers,
+            "upsert_concurrency": args.upsert_concurrency
+        },
+        "stages": profiler.stages,
+        "total_seconds": sum(stage["seconds"] for stage in profiler.stages),
+        "chunk_chars_mean": sum(len(c["text"]) for c in chunks) / len(chunks) if chunks else 0,
+        "upsert_requests": sink.requests,
+        "upsert_payload_mb": sink.payload_bytes / 2**20
+    }
+    print(f"Total    {report['total_seconds']:8.2f} s, {sink.requests} upsert requests, "
+          f"{report['upsert_payload_mb']:.1f} MB payload")
+    if args.profile_output:
+        with open(args.profile_output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Profile written to {args.profile_output}")
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the vector index, section index and BM25 index from the books.")
+    parser.add_argument("--mode", choices=("diff", "full"), default=BUILD_MODE,
+                        help="diff uploads only changed chunks; full rebuilds the index")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP)
+    parser.add_argument("--embed-batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--embed-workers", type=int, default=EMBED_WORKERS)
+    parser.add_argument("--extract-workers", type=int, default=EXTRACT_WORKERS)
+    parser.add_argument("--upsert-concurrency", type=int, default=UPSERT_CONCURRENCY)
+    parser.add_argument("--dry-run", action="store_true",
+                        help="send vectors to a local sink instead of the index and write no files")
+    parser.add_argument("--profile", action="store_true",
+                        help="run the stages one by one against the dry-run sink and report time and memory")
+    parser.add_argument("--profile-output", help="write the profile report as JSON to this path")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.profile:
+        profile_build(args)
+    else:
+        build(args)
+
+
+if __name__ == "__main__":
+    main()
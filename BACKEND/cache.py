@@ -0,0 +1,90 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_query(text: str):
+    """Cache key form of a query: case, spacing and trailing punctuation ignored."""
+    return " ".join(text.lower().split()).rstrip("?.! ")
+
+
+def approx_sizeof(value):
+    """Rough deep size in bytes of plain containers, strings and numbers."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approx_sizeof(k) + approx_sizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(approx_sizeof(item) for item in value)
+    return size
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after ttl_seconds. Bounded by
+    entry count and, optionally, by approximate memory in bytes.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, max_bytes: int = 0, sizeof=approx_sizeof):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at, size = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if self.max_entries <= 0:
+            return
+        size = self.sizeof(value) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes and self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,110 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# Prompt space for retrieved law text, in estimated tokens (about 4 chars each).
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+CHARS_PER_TOKEN = 4
+
+# Neighbouring chunks share up to 300 characters (the splitter's overlap);
+# shorter common runs are treated as coincidence, not as the same text.
+MIN_OVERLAP_CHARS = 40
+
+ACT_HEADERS = {
+    "BNS": "=== BNS (Bharatiya Nyaya Sanhita - Substantive Criminal Law) ===",
+    "BNSS": "=== BNSS (Bharatiya Nagarik Suraksha Sanhita - Criminal Procedure) ===",
+    "BSA": "=== BSA (Bharatiya Sakshya Adhiniyam - Evidence Law) ==="
+}
+
+
+def estimate_tokens(text: str):
+    return len(text) // CHARS_PER_TOKEN
+
+
+def overlap_length(left: str, right: str):
+    """Length of the longest suffix of left that is a prefix of right (0 if too short)."""
+    probe = right[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    start = left.find(probe, max(0, len(left) - len(right)))
+    while start != -1:
+        if right.startswith(left[start:]):
+            return len(left) - start
+        start = left.find(probe, start + 1)
+    return 0
+
+
+def merge_text(left: str, right: str):
+    """left and right as one contiguous span, or None if they do not touch."""
+    if right in left:
+        return left
+    if left in right:
+        return right
+    shared = overlap_length(left, right)
+    if shared:
+        return left + right[shared:]
+    shared = overlap_length(right, left)
+    if shared:
+        return right + left[shared:]
+    return None
+
+
+def pack_context(docs_by_source: dict, budget_tokens: int = CONTEXT_TOKEN_BUDGET):
+    """
+    Fill the token budget with the best-scoring chunks across all acts.
+    Chunks that overlap one already taken are merged into a single span, so
+    the shared text is paid for once; a chunk that would overflow the budget
+    is skipped in favour of later, smaller additions.
+
+    Returns (context, used_docs), where used_docs is [(act, doc), ...] in
+    score order.
+    """
+    candidates = [
+        (act, doc)
+        for act, docs in docs_by_source.items()
+        for doc in docs
+    ]
+    # Stable sort: equal scores (exact section lookups) keep document order.
+    candidates.sort(key=lambda candidate: candidate[1]["score"], reverse=True)
+
+    budget_chars = budget_tokens * CHARS_PER_TOKEN
+    spans = {act: [] for act in docs_by_source}
+    used_chars = 0
+    used_docs = []
+
+    for act, doc in candidates:
+        text = doc["text"]
+        merged = {"text": text, "score": doc["score"]}
+        absorbed = set()
+        # A new chunk can bridge two spans, so keep merging until nothing touches.
+        changed = True
+        while changed:
+            changed = False
+            for position, span in enumerate(spans[act]):
+                if position in absorbed:
+                    continue
+                joined = merge_text(span["text"], merged["text"])
+                if joined is not None:
+                    merged = {"text": joined, "score": max(span["score"], merged["score"])}
+                    absorbed.add(position)
+                    changed = True
+
+        added = len(merged["text"]) - sum(len(spans[act][position]["text"]) for position in absorbed)
+        if added and used_chars + added > budget_chars:
+            continue
+
+        spans[act] = [span for position, span in enumerate(spans[act]) if position not in absorbed] + [merged]
+        used_chars += added
+        used_docs.append((act, doc))
+
+    sections = []
+    for act, act_spans in spans.items():
+        if not act_spans:
+            continue
+        act_spans.sort(key=lambda span: span["score"], reverse=True)
+        sections.append(ACT_HEADERS.get(act, f"=== {act} ==="))
+        sections.append("\n\n".join(span["text"] for span in act_spans))
+
+    return "\n\n".join(sections), used_docs
@@ -0,0 +1,90 @@
+import os
+import time
+from dotenv import load_dotenv
+from transport import EMBEDDING, configure_huggingface
+
+load_dotenv()
+
+
+HF_API_KEY = os.getenv("HF_API_KEY")
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# "local" runs the model in-process with PyTorch, "onnx" runs the quantised
+# ONNX export through sentence-transformers (needs optimum[onnxruntime]),
+# "remote" calls the Hugging Face Inference API.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "local")
+ONNX_MODEL_FILE = os.getenv("ONNX_MODEL_FILE", "onnx/model_qint8_avx2.onnx")
+
+
+class LocalEmbedder:
+    """Query embeddings from an in-process sentence-transformers model."""
+
+    def __init__(self, onnx: bool = False):
+        from sentence_transformers import SentenceTransformer
+
+        if onnx:
+            self.backend = "onnx"
+            self.model = SentenceTransformer(
+                EMBEDDING_MODEL,
+                device="cpu",
+                backend="onnx",
+                model_kwargs={"file_name": ONNX_MODEL_FILE}
+            )
+        else:
+            self.backend = "local"
+            self.model = SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+
+    def embed_many(self, texts: list[str]):
+        embeddings = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
+        return embeddings.tolist()
+
+    def embed(self, text: str):
+        return self.embed_many([text])[0]
+
+
+class RemoteEmbedder:
+    """Query embeddings from the Hugging Face Inference API."""
+
+    backend = "remote"
+
+    def __init__(self):
+        from huggingface_hub import InferenceClient
+
+        configure_huggingface(EMBEDDING)
+        self.client = InferenceClient(token=HF_API_KEY, timeout=EMBEDDING.timeout)
+
+    def embed(self, text: str):
+        embedding = self.client.feature_extraction(text, model=EMBEDDING_MODEL)
+
+        if isinstance(embedding[0], list):
+            embedding = embedding[0]
+
+        return [float(x) for x in embedding]
+
+    def embed_many(self, texts: list[str]):
+        return [self.embed(text) for text in texts]
+
+
+def load_embedder(backend: str = EMBEDDING_BACKEND):
+    """
+    Load and warm up the configured embedder. A local backend that cannot be
+    loaded (missing package or model files) falls back to the remote API.
+    """
+    if backend == "remote":
+        embedder = RemoteEmbedder()
+    elif backend in ("local", "onnx"):
+        try:
+            embedder = LocalEmbedder(onnx=backend == "onnx")
+        except (ImportError, OSError) as e:
+            print(f"Local embedder unavailable ({e}); using the remote API.")
+            embedder = RemoteEmbedder()
+    else:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+
+    if embedder.backend != "remote":
+        # The first encode call pays for lazy initialisation; do it now.
+        start = time.perf_counter()
+        embedder.embed("warm up")
+        print(f"Embedder ready ({embedder.backend}, warm-up {(time.perf_counter() - start) * 1000:.0f} ms)")
+
+    return embedder
@@ -0,0 +1,127 @@
+import os
+import json
+import math
+import re
+from collections import Counter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", "bm25_index.json")
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an and any are as at be by for from has have he her his if in into is it its
+may not of on or shall she such that the their them there this to was were which
+who whom with what when where will would can i my me do does
+""".split())
+
+
+def tokenize(text: str):
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25IndexBuilder:
+    """
+    Inverted index over chunk text, filled while chunks stream through
+    build_db.py. Postings are stored flat as [doc, tf, doc, tf, ...] to keep
+    the file small.
+    """
+
+    def __init__(self):
+        self.ids = []
+        self.sources = []
+        self.lengths = []
+        self.postings = {}
+        self._seen = set()
+
+    def add(self, chunk: dict):
+        if chunk["id"] in self._seen:
+            return
+        self._seen.add(chunk["id"])
+        doc = len(self.ids)
+        tokens = tokenize(chunk["text"])
+        self.ids.append(chunk["id"])
+        self.sources.append(chunk["source"])
+        self.lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            self.postings.setdefault(term, []).extend((doc, tf))
+
+    def save(self, path: str = BM25_INDEX_PATH):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "ids": self.ids,
+                "sources": self.sources,
+                "lengths": self.lengths,
+                "postings": self.postings
+            }, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+
+class BM25Index:
+    """BM25 search over the file written by build_db.py, reloaded when it changes."""
+
+    def __init__(self, path: str = BM25_INDEX_PATH):
+        self.path = path
+        self._mtime = None
+        self._ids = []
+        self._sources = []
+        self._lengths = []
+        self._postings = {}
+        self._average_length = 0.0
+        self.reload_if_changed()
+
+    def reload_if_changed(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._ids = data["ids"]
+            self._sources = data["sources"]
+            self._lengths = data["lengths"]
+            self._postings = data["postings"]
+            self._average_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+            self._mtime = mtime
+
+    def __len__(self):
+        return len(self._ids)
+
+    def search(self, query: str, top_k: int = 20, source: str = None):
+        """Return [(chunk id, source, score), ...], best first, optionally from one act only."""
+        self.reload_if_changed()
+        if not self._ids:
+            return []
+
+        doc_count = len(self._ids)
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            df = len(postings) // 2
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            for i in range(0, len(postings), 2):
+                doc, tf = postings[i], postings[i + 1]
+                if source is not None and self._sources[doc] != source:
+                    continue
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[doc] / self._average_length)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(self._ids[doc], self._sources[doc], score) for doc, score in best]
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = 60):
+    """Fuse ranked ID lists: each list adds 1 / (k + rank) to an ID's score."""
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
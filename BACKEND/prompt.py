@@ -0,0 +1,76 @@
+import os
+import hashlib
+import re
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+SYSTEM_PROMPT_PATH = os.getenv("SYSTEM_PROMPT_PATH", "system_prompt.txt")
+
+PLACEHOLDER = re.compile(r"\{(context|query)\}")
+
+
+class PromptTemplate:
+    """
+    The system prompt, split once into literal text and {context} / {query}
+    slots. render() is a single join, so braces in retrieved statutes or in
+    the user's question are copied verbatim instead of being parsed as format
+    fields. The file is re-read only when its mtime changes.
+    """
+
+    def __init__(self, path: str = SYSTEM_PROMPT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._parts = []
+        self.version = None
+        self.reload_if_changed()
+
+    def reload_if_changed(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            with open(self.path, "r", encoding="utf-8") as f:
+                text = f.read()
+            # Odd positions are slot names; literals keep str.format's {{ }} escapes.
+            parts = PLACEHOLDER.split(text)
+            for i in range(0, len(parts), 2):
+                parts[i] = parts[i].replace("{{", "{").replace("}}", "}")
+            self._parts = parts
+            self.version = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+            self._mtime = mtime
+
+    def render(self, **values):
+        self.reload_if_changed()
+        parts = self._parts
+        return "".join(values[part] if i % 2 else part for i, part in enumerate(parts))
+
+
+def format_conversation(conversation_history: list[dict], summary: list[str] = None, max_messages: int = 16):
+    lines = ["\n\n=== PREVIOUS CONVERSATION ==="]
+    if summary:
+        lines.append("Summary of earlier turns:")
+        lines.extend(summary)
+        lines.append("")
+    for msg in conversation_history[-max_messages:]:
+        role = msg.get("role", "user")
+        content = msg.get("content", "")
+        if role == "user":
+            lines.append(f"User: {content}")
+        elif role == "assistant":
+            lines.append(f"Assistant: {content}")
+    lines.append("\n=== END OF PREVIOUS CONVERSATION ===\n\n")
+    return "\n".join(lines)
+
+
+def render_prompt(template: PromptTemplate, context: str, query: str, conversation_history: list[dict] = None,
+                  summary: list[str] = None):
+    """Fill the template in one pass; prior turns go in front of the current question."""
+    if conversation_history or summary:
+        query = f"{format_conversation(conversation_history or [], summary)}Current Question: {query}"
+    return template.render(context=context, query=query)
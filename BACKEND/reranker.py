@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# Off unless RERANK_ENABLED=true; the cross-encoder adds CPU work per query.
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# The best RERANK_CANDIDATES retrieved chunks are scored in batches of
+# RERANK_BATCH_SIZE on the request's own thread, and the top RERANK_KEEP are
+# kept. At most RERANK_WORKERS requests rerank at once; beyond that, and when
+# scoring passes RERANK_BUDGET_MS, the retrieval order is used instead.
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))
+RERANK_KEEP = int(os.getenv("RERANK_KEEP", "12"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "8"))
+RERANK_WORKERS = int(os.getenv("RERANK_WORKERS", "2"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "300"))
+
+
+class CrossEncoderReranker:
+    """
+    Scores (query, chunk) pairs with a small CPU cross-encoder under a time
+    budget. Scoring runs in the caller's thread and the deadline is checked
+    between batches, so an abandoned rerank stops using CPU after at most
+    one more batch instead of running on in a shared pool.
+    """
+
+    def __init__(self, model_name: str = RERANK_MODEL, workers: int = RERANK_WORKERS,
+                 batch_size: int = RERANK_BATCH_SIZE):
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = model_name
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.batch_size = batch_size
+        self._slots = threading.BoundedSemaphore(workers)
+        self.completed = 0
+        self.timeouts = 0
+        self.skipped = 0
+
+    def score(self, query: str, texts: list[str], budget_ms: float = RERANK_BUDGET_MS):
+        """
+        Relevance scores in input order, or None if every rerank slot is busy
+        or the budget runs out before the last batch starts.
+        """
+        if not self._slots.acquire(blocking=False):
+            self.skipped += 1
+            return None
+        try:
+            deadline = time.perf_counter() + budget_ms / 1000
+            scores = []
+            for i in range(0, len(texts), self.batch_size):
+                if time.perf_counter() >= deadline:
+                    self.timeouts += 1
+                    return None
+                batch = texts[i:i + self.batch_size]
+                scores.extend(self.model.predict([(query, text) for text in batch], batch_size=self.batch_size))
+        finally:
+            self._slots.release()
+        self.completed += 1
+        return [float(score) for score in scores]
+
+    def stats(self):
+        return {
+            "model": self.model_name,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "skipped": self.skipped,
+            "budget_ms": RERANK_BUDGET_MS
+        }
+
+
+def load_reranker(enabled: bool = RERANK_ENABLED):
+    """The warmed-up reranker, or None when disabled or the model cannot be loaded."""
+    if not enabled:
+        return None
+    try:
+        reranker = CrossEncoderReranker()
+    except (ImportError, OSError) as e:
+        print(f"Reranker unavailable ({e}); using retrieval order.")
+        return None
+
+    start = time.perf_counter()
+    reranker.score("warm up", ["warm up"], budget_ms=60_000)
+    reranker.completed = 0
+    print(f"Reranker ready ({reranker.model_name}, warm-up {(time.perf_counter() - start) * 1000:.0f} ms)")
+    return reranker
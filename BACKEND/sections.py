@@ -0,0 +1,132 @@
+import os
+import json
+import re
+from collections import defaultdict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+SECTION_INDEX_PATH = os.getenv("SECTION_INDEX_PATH", "section_index.json")
+
+# A section heading starts a line, possibly after a marginal note that the PDF
+# text puts on the same line: "103. Whoever ...", "126.(1)Whoever ...",
+# "Definitions. 2.In this ...". Cross references ("under section 117. The")
+# are excluded by the lookbehind.
+SECTION_HEADING = re.compile(
+    r"^(?:[A-Za-z0-9][A-Za-z0-9 ,.'’\-]{0,40}?[ ]+)?(?<![Ss]ection )(\d{1,3})\.[ ]?(?=[A-Z(])",
+    re.MULTILINE
+)
+
+# Largest forward jump accepted between consecutive headings of one act.
+MAX_SECTION_GAP = 10
+
+# A schedule ends an act's numbered sections: "THE FIRST SCHEDULE",
+# "THE SCHEDULE", or "THESCHEDULE" where the PDF text drops the spaces.
+SCHEDULE_HEADING = re.compile(r"^[ ]*THE[ ]*(?:[A-Z]+[ ]+)?SCHEDULE[ ]*$", re.MULTILINE)
+
+SECTION_QUERY = re.compile(r"section\s+(\d+)", re.IGNORECASE)
+ACT_MENTION = re.compile(r"\b(bnss|bns|bsa)\b", re.IGNORECASE)
+
+
+class SectionIndexBuilder:
+    """
+    Collects (act, section) -> chunk IDs while chunks stream past in document
+    order. Sections of an act are numbered in increasing order, so a heading
+    is accepted only if it repeats one already seen (chunk overlap) or moves
+    forward by at most MAX_SECTION_GAP; anything else is a stray number.
+    A chunk that does not open with a heading also belongs to the section
+    still running from the previous chunk. The act's first schedule heading
+    ends its sections: the schedules that follow (offence tables, forms)
+    belong to no section.
+    """
+
+    def __init__(self):
+        self.sections = defaultdict(lambda: defaultdict(list))
+        self._last = defaultdict(int)
+        self._seen = defaultdict(set)
+        self._ended = set()
+
+    def add(self, chunk: dict):
+        """Record the chunk's section headings and return their numbers."""
+        act = chunk["source"]
+        if act in self._ended:
+            return []
+        text = chunk["text"]
+        schedule = SCHEDULE_HEADING.search(text)
+        if schedule:
+            self._ended.add(act)
+            text = text[:schedule.start()]
+
+        running_section = self._last[act]
+        opens_with_heading = False
+        found = []
+        for match in SECTION_HEADING.finditer(text):
+            number = int(match.group(1))
+            last = self._last[act]
+            if number not in self._seen[act] and not last < number <= last + MAX_SECTION_GAP:
+                continue
+            self._seen[act].add(number)
+            self._last[act] = max(last, number)
+            opens_with_heading = opens_with_heading or match.start() == 0
+            if number not in found:
+                found.append(number)
+                self._add_chunk(act, number, chunk["id"])
+
+        if running_section and not opens_with_heading and text.strip():
+            self._add_chunk(act, running_section, chunk["id"])
+        return found
+
+    def _add_chunk(self, act: str, number: int, chunk_id: str):
+        ids = self.sections[act][str(number)]
+        if chunk_id not in ids:
+            ids.append(chunk_id)
+
+    def save(self, path: str = SECTION_INDEX_PATH):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"sections": self.sections}, f)
+        os.replace(tmp_path, path)
+
+
+class SectionIndex:
+    """Exact section lookups from the file written by build_db.py, reloaded when it changes."""
+
+    def __init__(self, path: str = SECTION_INDEX_PATH):
+        self.path = path
+        self._mtime = None
+        self._sections = {}
+        self.reload_if_changed()
+
+    def reload_if_changed(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._sections = json.load(f)["sections"]
+            self._mtime = mtime
+
+    def __len__(self):
+        return sum(len(sections) for sections in self._sections.values())
+
+    def lookup(self, query: str):
+        """
+        Return {act: [chunk ids]} for a "section N" query, limited to the acts
+        the query names (if any). Empty when the query is not a section
+        lookup or no act has that section.
+        """
+        section_match = SECTION_QUERY.search(query)
+        if not section_match:
+            return {}
+        self.reload_if_changed()
+
+        section = str(int(section_match.group(1)))
+        acts = {act.upper() for act in ACT_MENTION.findall(query)} or set(self._sections)
+
+        return {
+            act: self._sections[act][section]
+            for act in sorted(acts)
+            if section in self._sections.get(act, {})
+        }
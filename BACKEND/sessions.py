@@ -0,0 +1,163 @@
+import os
+import json
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+from cache import TTLCache
+from context import estimate_tokens
+
+load_dotenv()
+
+
+# "memory" keeps sessions in this process; "sqlite" shares them between
+# workers and survives restarts.
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "86400"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+
+# The last HISTORY_RECENT_MESSAGES messages go into the prompt verbatim;
+# older ones are folded into a summary capped at HISTORY_SUMMARY_TOKENS.
+HISTORY_RECENT_MESSAGES = int(os.getenv("HISTORY_RECENT_MESSAGES", "6"))
+HISTORY_SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", "300"))
+SUMMARY_LINE_CHARS = 200
+# Verbatim messages are cut to this length, so long answers cannot grow the prompt.
+HISTORY_MESSAGE_CHARS = int(os.getenv("HISTORY_MESSAGE_CHARS", "2000"))
+
+FIRST_SENTENCE = re.compile(r"^(.+?[.?!])(?:\s|$)", re.DOTALL)
+
+
+def new_session_id():
+    return secrets.token_urlsafe(16)
+
+
+def message(role: str, content: str):
+    if len(content) > HISTORY_MESSAGE_CHARS:
+        content = content[:HISTORY_MESSAGE_CHARS].rsplit(" ", 1)[0] + " ..."
+    return {"role": role, "content": content}
+
+
+def new_session(conversation_history: list[dict] = None):
+    """
+    A fresh session, optionally seeded with a client-side transcript. Older
+    clients send answers as an "answer" field on the user message; those are
+    split back into assistant messages.
+    """
+    session = {"id": new_session_id(), "summary": [], "messages": []}
+    for msg in conversation_history or []:
+        role = msg.get("role", "user")
+        if role in ("user", "assistant") and msg.get("content"):
+            session["messages"].append(message(role, msg["content"]))
+        if msg.get("answer"):
+            session["messages"].append(message("assistant", msg["answer"]))
+    compact(session)
+    return session
+
+
+def summarize_message(msg: dict):
+    """One extractive summary line: the speaker and their first sentence."""
+    text = " ".join(msg["content"].split())
+    match = FIRST_SENTENCE.match(text)
+    sentence = match.group(1) if match else text
+    if len(sentence) > SUMMARY_LINE_CHARS:
+        sentence = sentence[:SUMMARY_LINE_CHARS].rsplit(" ", 1)[0] + " ..."
+    speaker = "User" if msg["role"] == "user" else "Assistant"
+    return f"{speaker}: {sentence}"
+
+
+def compact(session: dict, recent: int = HISTORY_RECENT_MESSAGES, summary_tokens: int = HISTORY_SUMMARY_TOKENS):
+    """
+    Move all but the last `recent` messages into the rolling summary, then
+    drop the oldest summary lines until it fits the token cap. Prompt size
+    stays bounded however long the conversation runs.
+    """
+    messages = session["messages"]
+    overflow = len(messages) - recent
+    if overflow > 0:
+        session["summary"].extend(summarize_message(msg) for msg in messages[:overflow])
+        session["messages"] = messages[overflow:]
+
+    summary = session["summary"]
+    while summary and estimate_tokens("\n".join(summary)) > summary_tokens:
+        summary.pop(0)
+
+
+def add_turn(session: dict, query: str, answer: str):
+    session["messages"].append(message("user", query))
+    session["messages"].append(message("assistant", answer))
+    compact(session)
+
+
+class MemorySessionStore:
+    """Sessions in this process, LRU-bounded and expiring after ttl_seconds idle."""
+
+    backend = "memory"
+
+    def __init__(self, max_sessions: int = SESSION_MAX_SESSIONS, ttl_seconds: float = SESSION_TTL_SECONDS):
+        # Stored as JSON so concurrent requests never share one mutable dict.
+        self._sessions = TTLCache(max_sessions, ttl_seconds)
+
+    def load(self, session_id: str):
+        state = self._sessions.get(session_id)
+        return json.loads(state) if state is not None else None
+
+    def save(self, session: dict):
+        self._sessions.set(session["id"], json.dumps(session))
+
+    def stats(self):
+        return {"backend": self.backend, **self._sessions.stats()}
+
+
+class SqliteSessionStore:
+    """Sessions in a SQLite file, so every worker process sees the same conversations."""
+
+    backend = "sqlite"
+
+    # Expired rows are purged once every this many saves.
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str = SESSION_DB_PATH, ttl_seconds: float = SESSION_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._saves = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+
+    def load(self, session_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state FROM sessions WHERE id = ? AND updated_at > ?",
+                (session_id, time.time() - self.ttl_seconds)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, session: dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, state, updated_at) VALUES (?, ?, ?)",
+                (session["id"], json.dumps(session), time.time())
+            )
+            self._saves += 1
+            if self._saves % self.PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM sessions WHERE updated_at <= ?", (time.time() - self.ttl_seconds,))
+
+    def stats(self):
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+        return {"backend": self.backend, "entries": count}
+
+
+def open_session_store(backend: str = SESSION_BACKEND):
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return SqliteSessionStore()
+    raise ValueError(f"Unknown session backend: {backend}")
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# Build upstream clients in the background as soon as the app starts; when
+# false they are built by the first request that needs them. A client that
+# fails to build is retried every WARMUP_RETRY_SECONDS.
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "5"))
+
+_UNSET = object()
+
+
+class LazyResource:
+    """
+    A client built on first use rather than at import, so a slow or
+    unreachable upstream cannot stop the process from starting. Concurrent
+    callers wait on a single build; a build that raises is attempted again
+    on the next call.
+    """
+
+    def __init__(self, name: str, factory, required: bool = True):
+        self.name = name
+        self.factory = factory
+        # Required resources must be built before the app reports ready.
+        self.required = required
+        self.seconds = None
+        self.error = None
+        self._value = _UNSET
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._value is not _UNSET
+
+    def get(self):
+        if self._value is not _UNSET:
+            return self._value
+        with self._lock:
+            if self._value is _UNSET:
+                start = time.perf_counter()
+                try:
+                    value = self.factory()
+                except Exception as e:
+                    self.error = str(e)
+                    raise
+                self.seconds = time.perf_counter() - start
+                self.error = None
+                self._value = value
+                print(f"{self.name} ready in {self.seconds * 1000:.0f} ms")
+        return self._value
+
+    async def aget(self):
+        """get() for coroutines: a build in progress runs off the event loop."""
+        if self._value is not _UNSET:
+            return self._value
+        return await asyncio.to_thread(self.get)
+
+    def set(self, value):
+        """Replace the resource, e.g. with a stand-in in the load-test harness."""
+        with self._lock:
+            self._value = value
+            self.error = None
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "required": self.required,
+            "init_ms": round(self.seconds * 1000, 1) if self.seconds is not None else None,
+            "error": self.error
+        }
+
+
+class Startup:
+    """Cold-start timeline: process import through every required resource being ready."""
+
+    def __init__(self, resources: list[LazyResource], started: float):
+        self.resources = resources
+        # perf_counter() reading taken before the app's heavy imports.
+        self.started = started
+        self.imported_seconds = None
+        self.ready_seconds = None
+
+    def imported(self):
+        self.imported_seconds = time.perf_counter() - self.started
+        print(f"App imported in {self.imported_seconds * 1000:.0f} ms")
+
+    @property
+    def ready(self):
+        return all(resource.ready for resource in self.resources if resource.required)
+
+    def check_ready(self):
+        if self.ready_seconds is None and self.ready:
+            self.ready_seconds = time.perf_counter() - self.started
+            print(f"App ready in {self.ready_seconds * 1000:.0f} ms after start")
+        return self.ready
+
+    async def warm_up(self, retry_seconds: float = WARMUP_RETRY_SECONDS):
+        """Build every resource off the event loop, concurrently, retrying failures until they succeed."""
+
+        async def build(resource: LazyResource):
+            while True:
+                try:
+                    await resource.aget()
+                    break
+                except Exception as e:
+                    print(f"{resource.name} unavailable ({e}); retrying in {retry_seconds:.0f} s")
+                    await asyncio.sleep(retry_seconds)
+            self.check_ready()
+
+        await asyncio.gather(*(build(resource) for resource in self.resources))
+
+    def stats(self):
+        return {
+            "ready": self.check_ready(),
+            "import_ms": round(self.imported_seconds * 1000, 1) if self.imported_seconds is not None else None,
+            "ready_ms": round(self.ready_seconds * 1000, 1) if self.ready_seconds is not None else None,
+            "resources": {resource.name: resource.stats() for resource in self.resources}
+        }
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Tests import the backend modules directly and never talk to Pinecone.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("VECTOR_BACKEND", "local")
@@ -0,0 +1,88 @@
+import json
+import time
+import zlib
+
+import numpy as np
+import pytest
+
+import build_db
+from vector_store import EMBEDDING_DIMENSION, LocalVectorStore
+
+
+class HashingModel:
+    """Stands in for the SentenceTransformer: one deterministic vector per text."""
+
+    def get_sentence_embedding_dimension(self):
+        return EMBEDDING_DIMENSION
+
+    def encode(self, texts, **kwargs):
+        vectors = np.zeros((len(texts), EMBEDDING_DIMENSION), dtype=np.float32)
+        for row, text in enumerate(texts):
+            vectors[row, zlib.crc32(text.encode("utf-8")) % EMBEDDING_DIMENSION] = 1.0
+        return vectors
+
+
+BOOK = "\n".join(
+    f"{number}. Section {number} of the test act. " + "Words of the section body. " * 20
+    for number in range(1, 9)
+)
+
+
+def build_args(data_dir, *extra):
+    return build_db.parse_args([
+        "--data-dir", str(data_dir), "--chunk-size", "300", "--chunk-overlap", "0",
+        "--embed-workers", "1", "--extract-workers", "1", *extra
+    ])
+
+
+def test_build_writes_manifest_at_default_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(build_db, "_embedding_model", HashingModel())
+    books = tmp_path / "books"
+    books.mkdir()
+    (books / "act.txt").write_text(BOOK, encoding="utf-8")
+
+    build_db.build(build_args(books))
+
+    with open("index_manifest.json", "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    store = LocalVectorStore("local_index")
+    assert manifest["ids"]
+    assert len(store) == len(manifest["ids"])
+    assert all(vector_id in store for vector_id in manifest["ids"])
+
+    # A diff build after the act changes keeps the manifest and adds to it.
+    (books / "act.txt").write_text(BOOK + "\n9. A new section.", encoding="utf-8")
+    build_db.build(build_args(books))
+    with open("index_manifest.json", "r", encoding="utf-8") as f:
+        rebuilt = json.load(f)["ids"]
+    assert set(manifest["ids"]) < set(rebuilt)
+
+
+class FailingIndex:
+    """Accepts upserts slowly, except for the batch holding `fail_id`, which fails at once."""
+
+    def __init__(self, fail_id: str):
+        self.fail_id = fail_id
+        self.accepted = []
+
+    def upsert(self, vectors, **kwargs):
+        if any(vector["id"] == self.fail_id for vector in vectors):
+            raise RuntimeError("upsert failed")
+        time.sleep(0.05)
+        self.accepted.append([vector["id"] for vector in vectors])
+
+
+def test_upload_checkpoints_batches_in_flight_when_one_fails(monkeypatch):
+    # One vector per batch and no retries, so the failure surfaces while the others are in flight.
+    monkeypatch.setattr(build_db.with_retries, "__kwdefaults__", {"retries": 0})
+    monkeypatch.setattr(build_db.batched_by_bytes, "__defaults__", (build_db.UPSERT_MAX_BYTES, 1))
+    vectors = [{"id": f"v{i}", "values": [0.0], "metadata": {"text": "x"}} for i in range(4)]
+    index = FailingIndex(fail_id="v3")
+    checkpointed = []
+
+    with pytest.raises(RuntimeError):
+        build_db.upload_vectors(index, iter(vectors), lambda batch: checkpointed.append([v["id"] for v in batch]), 4)
+
+    assert index.accepted
+    assert sorted(checkpointed) == sorted(index.accepted)
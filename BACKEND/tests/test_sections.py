@@ -0,0 +1,119 @@
+import build_db
+from sections import SectionIndexBuilder
+
+
+# The last two sections of the BNSS and the start of its First Schedule, as
+# the PDF text extraction returns them, one string per page.
+BNSS_TAIL = [
+    """\
+Trial and 530.All trials, inquires and proceedings under this Sanhita, including—
+proceedings to
+be held in (i)issuance, service and execution of summons and warrant;
+electronic
+(ii)examination of complainant and witnesses;
+mode.
+(iii)recording of evidence in inquiries and trials; and
+(iv)all appellate proceedings or any other proceeding,
+may be held in electronic mode, by use of electronic communication or use of audio-video
+electronic means.
+Repeal and 531. (1) The Code of Criminal Procedure, 1973 is hereby repealed. 2 of 1974.
+savings.
+(2)Notwithstanding such repeal—
+(a) if, immediately before the date on which this Sanhita comes into force, there
+is any appeal, application, trial, inquiry or investigation pending, then, such appeal,
+application, trial, inquiry or investigation shall be disposed of, continued, held or
+made, as the case may be, in accordance with the provisions of the Code of Criminal
+""",
+    """\
+Sec. 1] THE GAZETTE OF INDIA EXTRAORDINARY 157
+157
+2 of 1974. Procedure, 1973, as in force immediately before such commencement (hereinafter
+referred to as the said Code), as if this Sanhita had not come into force;
+(b)all notifications published, proclamations issued, powers conferred, forms
+provided by rules, local jurisdictions defined, sentences passed and orders, rules and
+appointments, not being appointments as Special Magistrates, made under the said
+Code and which are in force immediately before the commencement of this Sanhita,
+shall be deemed, respectively, to have been published, issued, conferred, specified,
+defined, passed or made under the corresponding provisions of this Sanhita;
+(c)any sanction accorded or consent given under the said Code in pursuance
+of which no proceeding was commenced under that Code, shall be deemed to have
+been accorded or given under the corresponding provisions of this Sanhita and
+proceedings may be commenced under this Sanhita in pursuance of such sanction or
+consent.
+(3)Where the period specified for an application or other proceeding under the said
+Code had expired on or before the commencement of this Sanhita, nothing in this Sanhita
+shall be construed as enabling any such application to be made or proceeding to be
+commenced under this Sanhita by reason only of the fact that a longer period therefor is
+specified by this Sanhita or provisions are made in this Sanhita for the extension of time.
+""",
+    """\
+158 THE GAZETTE OF INDIA EXTRAORDINARY [Part II—
+THE FIRST SCHEDULE
+CLASSIFICATION OF OFFENCES
+EXPLANATORY NOTES: (1) In regard to offences under the Bharatiya Nyaya Sanhita, the entries in the second and
+third columns against a section the number of which is given in the first column are not
+intended as the definition of, and the punishment prescribed for, the offence in the Bharatiya
+Nyaya Sanhita, but merely as indication of the substance of the section.
+(2)In this Schedule, (i) the expression "Magistrate of the first class" and "any Magistrate"
+does not include Executive Magistrates; (ii) the word "cognizable" stands for "a police officer
+may arrest without warrant"; and (iii) the word "non-cognizable" stands for "a police officer
+shall not arrest without warrant".
+I.—OFFENCES UNDER THE BHARATIYA NYAYA SANHITA
+Section Offence Punishment Cognizable or Non- Bailable or Non- By what Court
+cognizable bailable triable
+1 2 3 4 5 6
+49 Abetment of any offence, Same as for offence According as offence According as offence Court by which offence
+if the act abetted is abetted. abetted is cognizable abetted is bailable or abetted is triable.
+committed in consequence, or non-cognizable. non-bailable.
+and where no express
+provision is made for its
+punishment.
+50 Abetment of any offence, Same as for offence According as offence According as offence Court by which offence
+if the person abetted does abetted. abetted is cognizable abetted is bailable or abetted is triable.
+act with different intention or non-cognizable. non-bailable.
+from that of abettor.
+51 Abetment of any offence, Same as for offence According as offence According as offence Court by which offence
+when one act is abetted and intended to be abetted. abetted is cognizable abetted is bailable or abetted is triable.
+a different act is done; or non-cognizable. non-bailable.
+subject to the proviso.
+52 Abettor when liable to Same as for offence According as offence According as offence Court by which offence
+cumulative punishment abetted. abetted is cognizable abetted is bailable or abetted is triable.
+for act abetted and for or non-cognizable. non-bailable.
+act done.
+53 Abetment of any offence, Same as for offence According as offence According as offence Court by which offence
+when an effect is caused by committed. abetted is cognizable abetted is bailable or abetted is triable.
+the act abetted different or non-cognizable. non-bailable.
+from that intended by the
+abettor.
+54 Abetment of any offence, Same as for offence According as offence According as offence Court by which offence
+if abettor present whe
+"""
+]
+
+
+def index_act(act: str, pages: list[str]):
+    builder = SectionIndexBuilder()
+    # Earlier sections, so the tail's headings continue the numbering.
+    builder.add({"id": "earlier", "source": act, "text": "".join(f"{n}. Section text.\n" for n in range(1, 530))})
+    chunks = list(build_db.make_chunks(act, pages, build_db.make_splitter(1500, 300)))
+    for chunk in chunks:
+        builder.add(chunk)
+    return builder.sections[act], chunks
+
+
+def test_last_section_stops_at_the_schedule():
+    sections, chunks = index_act("BNSS", BNSS_TAIL)
+    first_schedule_chunk = next(i for i, chunk in enumerate(chunks) if "THE FIRST SCHEDULE" in chunk["text"])
+    section_chunks = {chunk_id for ids in sections.values() for chunk_id in ids}
+
+    assert sections["530"] and sections["531"]
+    # Chunks past the schedule heading belong to no section.
+    assert not {chunk["id"] for chunk in chunks[first_schedule_chunk + 1:]} & section_chunks
+
+
+def test_schedule_heading_without_spaces_ends_the_act():
+    builder = SectionIndexBuilder()
+    builder.add({"id": "a", "source": "BSA", "text": "1. Short title.\n2. Definitions.\nTHESCHEDULE\n1. Name of party"})
+    builder.add({"id": "b", "source": "BSA", "text": "2. Designation of expert"})
+
+    assert builder.sections["BSA"] == {"1": ["a"], "2": ["a"]}
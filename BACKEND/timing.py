@@ -0,0 +1,35 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+# Stage name -> seconds for the request being handled. Blocking work must be
+# run under contextvars.copy_context() (see bot.run_blocking) so worker
+# threads record into the same dict.
+request_timings = ContextVar("request_timings", default=None)
+
+
+def begin_request():
+    timings = {}
+    request_timings.set(timings)
+    return timings
+
+
+def record(name: str, seconds: float):
+    timings = request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def server_timing(timings: dict):
+    """Value for a Server-Timing response header."""
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
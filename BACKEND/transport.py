@@ -0,0 +1,177 @@
+import asyncio
+import importlib
+import importlib.util
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dotenv import load_dotenv
+from metrics import Histogram
+
+load_dotenv()
+
+
+# Idle connections are kept open this long for reuse. HTTP/2 lets
+# concurrent requests to one host share a connection instead of queueing
+# behind each other; it is used only where the h2 package is installed.
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true" and importlib.util.find_spec("h2") is not None
+
+upstream_seconds = Histogram("lawgpt_upstream_seconds", "Time spent in calls to each upstream.", ("upstream",))
+upstream_wait_seconds = Histogram(
+    "lawgpt_upstream_wait_seconds", "Time spent waiting for a free upstream slot.", ("upstream",)
+)
+
+
+def is_timeout(error: Exception):
+    # httpx, urllib3 and asyncio each have their own timeout exceptions.
+    return isinstance(error, TimeoutError) or "timeout" in type(error).__name__.lower()
+
+
+class Upstream:
+    """
+    Connection pool size, timeout and concurrency limit for one upstream
+    service, overridable with <NAME>_TIMEOUT_SECONDS, <NAME>_MAX_CONNECTIONS
+    and <NAME>_MAX_CONCURRENCY. Calls made inside limit() (threads) or
+    alimit() (coroutines) wait for one of max_concurrency slots, so a burst
+    queues here instead of opening a connection per request; the two kinds
+    of caller have separate slots.
+    """
+
+    def __init__(self, name: str, timeout: float, max_connections: int, max_concurrency: int):
+        prefix = name.upper()
+        self.name = name
+        self.timeout = float(os.getenv(f"{prefix}_TIMEOUT_SECONDS", timeout))
+        self.max_connections = int(os.getenv(f"{prefix}_MAX_CONNECTIONS", max_connections))
+        self.max_concurrency = int(os.getenv(f"{prefix}_MAX_CONCURRENCY", max_concurrency))
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._async_slots = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        # outcome ("ok", "error", "timeout", "cancelled") -> calls
+        self.outcomes = {}
+
+    def _count(self, field: str, amount: int):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def _finish(self, started: float, error: Exception = None):
+        if error is None:
+            outcome = "ok"
+        elif isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+            outcome = "cancelled"
+        else:
+            outcome = "timeout" if is_timeout(error) else "error"
+        upstream_seconds.observe(time.perf_counter() - started, self.name)
+        with self._lock:
+            self.in_flight -= 1
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    @contextmanager
+    def limit(self):
+        wait_started = time.perf_counter()
+        self._count("waiting", 1)
+        try:
+            self._slots.acquire()
+        finally:
+            self._count("waiting", -1)
+        started = time.perf_counter()
+        upstream_wait_seconds.observe(started - wait_started, self.name)
+        self._count("in_flight", 1)
+        try:
+            yield
+        except BaseException as e:
+            self._finish(started, e)
+            raise
+        else:
+            self._finish(started)
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def alimit(self):
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.max_concurrency)
+        wait_started = time.perf_counter()
+        self._count("waiting", 1)
+        try:
+            await self._async_slots.acquire()
+        finally:
+            self._count("waiting", -1)
+        started = time.perf_counter()
+        upstream_wait_seconds.observe(started - wait_started, self.name)
+        self._count("in_flight", 1)
+        try:
+            yield
+        except BaseException as e:
+            self._finish(started, e)
+            raise
+        else:
+            self._finish(started)
+        finally:
+            self._async_slots.release()
+
+    def httpx_args(self, http):
+        """Client keyword arguments for an httpx-compatible module: pooled keep-alive, timeouts, HTTP/2."""
+        return {
+            "limits": http.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+                keepalive_expiry=HTTP_KEEPALIVE_SECONDS
+            ),
+            "timeout": http.Timeout(self.timeout, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+            "http2": HTTP2_ENABLED
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "max_concurrency": self.max_concurrency,
+                "max_connections": self.max_connections,
+                "timeout_seconds": self.timeout,
+                "calls": dict(self.outcomes)
+            }
+
+
+# Gemini answers take seconds and stream for longer, so its timeout is the
+# longest; Pinecone queries and HF embeddings are short round trips.
+LLM = Upstream("llm", timeout=60, max_connections=32, max_concurrency=32)
+EMBEDDING = Upstream("embedding", timeout=10, max_connections=16, max_concurrency=16)
+INDEX = Upstream("index", timeout=10, max_connections=32, max_concurrency=32)
+UPSTREAMS = (LLM, EMBEDDING, INDEX)
+
+
+def llm_client_args(upstream: Upstream = LLM):
+    """
+    client_args for ChatGoogleGenerativeAI, which hands them to both the sync
+    and async httpx clients of google-genai. With aiohttp installed the SDK
+    sends async calls through aiohttp, which rejects these arguments, so the
+    SDK defaults are left in place then.
+    """
+    if importlib.util.find_spec("aiohttp") is not None:
+        return None
+    import httpx
+
+    return upstream.httpx_args(httpx)
+
+
+def configure_huggingface(upstream: Upstream = EMBEDDING):
+    """
+    Make huggingface_hub's shared HTTP client (used by InferenceClient) pool
+    and keep alive connections per the upstream's settings. The hub's own
+    client is built first to keep its request hooks and httpx flavour.
+    """
+    import huggingface_hub
+
+    default = huggingface_hub.get_session()
+    http = importlib.import_module(type(default).__module__.split(".")[0])
+    event_hooks = default.event_hooks
+
+    def client_factory():
+        return http.Client(event_hooks=event_hooks, follow_redirects=True, **upstream.httpx_args(http))
+
+    huggingface_hub.set_client_factory(client_factory)
@@ -0,0 +1,734 @@
+import os
+import hashlib
+import json
+import mmap
+import shutil
+import threading
+import time
+from array import array
+from types import SimpleNamespace
+from dotenv import load_dotenv
+from transport import INDEX
+
+load_dotenv()
+
+
+PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
+INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "lawgpt")
+EMBEDDING_DIMENSION = 384
+
+# "pinecone" for the hosted index, "local" for the in-process index below.
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "local_index")
+# Storage type of the local embedding matrix; float16 halves its size.
+LOCAL_INDEX_DTYPE = os.getenv("LOCAL_INDEX_DTYPE", "float16")
+
+# Pinecone keeps the corpus version as metadata on a marker vector in its own
+# namespace, so it never shows up in search results.
+VERSION_NAMESPACE = "lawgpt-meta"
+VERSION_VECTOR_ID = "index-version"
+INDEX_VERSION_REFRESH_SECONDS = float(os.getenv("INDEX_VERSION_REFRESH_SECONDS", "60"))
+
+# Chunk text and metadata by ID, written by build_db.py for Pinecone builds
+# so queries can skip include_metadata and read text locally. The local
+# backend reads text from its own artifact instead.
+CHUNK_STORE_DIR = os.getenv("CHUNK_STORE_DIR", "chunk_store")
+
+
+def open_pinecone_index(create: bool = False, pool_threads: int = 1):
+    from pinecone import Pinecone, ServerlessSpec
+
+    # One pooled, keep-alive connection per thread that may query at once.
+    pc = Pinecone(
+        api_key=PINECONE_API_KEY,
+        timeout=INDEX.timeout,
+        connection_pool_maxsize=max(INDEX.max_connections, pool_threads)
+    )
+
+    if create:
+        existing_indexes = pc.list_indexes().names()
+        if INDEX_NAME in existing_indexes:
+
+            index_info = pc.describe_index(INDEX_NAME)
+            if index_info.dimension != EMBEDDING_DIMENSION:
+                print(f"Deleting existing index with dimension {index_info.dimension}...")
+                pc.delete_index(INDEX_NAME)
+                print("Index deleted. Creating new index with correct dimension...")
+                time.sleep(5)
+                existing_indexes = []
+
+        if INDEX_NAME not in existing_indexes:
+            print(f"Creating new Pinecone index with dimension {EMBEDDING_DIMENSION}...")
+            pc.create_index(
+                name=INDEX_NAME,
+                dimension=EMBEDDING_DIMENSION,
+                metric="cosine",
+                spec=ServerlessSpec(
+                    cloud="aws",
+                    region="us-east-1"
+                )
+            )
+            print("Index created successfully!")
+
+    return pc.Index(INDEX_NAME, pool_threads=pool_threads)
+
+
+def open_index(backend: str = VECTOR_BACKEND, create: bool = False, pool_threads: int = 1):
+    """
+    Open the configured vector index. Both backends answer the same subset of
+    the Pinecone Index API: upsert, delete, query, fetch and
+    describe_index_stats.
+    """
+    if backend == "pinecone":
+        return open_pinecone_index(create=create, pool_threads=pool_threads)
+    if backend == "local":
+        return LocalVectorStore(LOCAL_INDEX_DIR)
+    raise ValueError(f"Unknown vector backend: {backend}")
+
+
+def corpus_version(ids):
+    """Version string derived from the set of chunk IDs in the index."""
+    return hashlib.sha256("\n".join(sorted(ids)).encode("utf-8")).hexdigest()[:16]
+
+
+def vector_count(index):
+    """Number of chunk vectors in the index, not counting the version marker."""
+    stats = index.describe_index_stats()
+    namespaces = getattr(stats, "namespaces", None)
+    if not namespaces:
+        return stats.total_vector_count
+    return sum(
+        summary.vector_count for name, summary in namespaces.items() if name != VERSION_NAMESPACE
+    )
+
+
+def fetch_metadata(index, ids: list[str]):
+    """Return {id: metadata} for the given IDs from either backend."""
+    response = index.fetch(ids=ids)
+    vectors = response["vectors"] if isinstance(response, dict) else response.vectors
+    return {
+        vector_id: vector["metadata"] if isinstance(vector, dict) else vector.metadata
+        for vector_id, vector in vectors.items()
+    }
+
+
+class ChunkStore:
+    """
+    Chunk text and metadata from the artifact build_db.py writes to
+    CHUNK_STORE_DIR: the LocalVectorStore layout without embeddings, so
+    workers share its mapped pages and hold no object per chunk. Reloaded
+    when a build publishes a new generation.
+    """
+
+    def __init__(self, path: str = CHUNK_STORE_DIR):
+        self.path = path
+        self._corpus = _Corpus(path)
+
+    def reload_if_changed(self):
+        try:
+            mtime = os.stat(os.path.join(self.path, "meta.json")).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._corpus.mtime:
+            self._corpus = _Corpus(self.path)
+
+    def __len__(self):
+        return self._corpus.count
+
+    def serves(self, index):
+        """Whether chunk text can be had without include_metadata on queries."""
+        self.reload_if_changed()
+        return bool(len(self)) or hasattr(index, "chunk_metadata")
+
+    def metadata(self, index, ids: list[str]):
+        """
+        Return {id: metadata} for the given IDs, read locally where possible:
+        from the local vector store itself, else from this store. IDs the
+        store does not know (a build newer than the file) are fetched from
+        the index.
+        """
+        read_local = getattr(index, "chunk_metadata", None)
+        if read_local is not None:
+            return read_local(ids)
+
+        self.reload_if_changed()
+        corpus = self._corpus
+        found = {}
+        for chunk_id in ids:
+            row = corpus.row(chunk_id)
+            if row is not None:
+                found[chunk_id] = corpus.metadata(row)
+        missing = [chunk_id for chunk_id in ids if chunk_id not in found]
+        if missing:
+            with INDEX.limit():
+                found.update(fetch_metadata(index, missing))
+        return found
+
+
+def publish_index_version(index, version: str):
+    """Record the corpus version after a build. The local store derives its own."""
+    if isinstance(index, LocalVectorStore):
+        return
+    values = [0.0] * EMBEDDING_DIMENSION
+    values[0] = 1.0
+    index.upsert(
+        vectors=[{"id": VERSION_VECTOR_ID, "values": values, "metadata": {"version": version}}],
+        namespace=VERSION_NAMESPACE
+    )
+
+
+class IndexVersion:
+    """
+    Current corpus version of an index, for keying caches. The local store
+    is checked on every call (a stat of meta.json, reloading the artifact if
+    it changed); Pinecone at most every refresh_seconds.
+    """
+
+    def __init__(self, index, refresh_seconds: float = INDEX_VERSION_REFRESH_SECONDS):
+        self.index = index
+        self.refresh_seconds = refresh_seconds
+        self._version = None
+        self._checked_at = 0.0
+
+    def current(self):
+        if isinstance(self.index, LocalVectorStore):
+            self.index.reload_if_changed()
+            return self.index.version
+
+        now = time.monotonic()
+        if self._version is None or now - self._checked_at >= self.refresh_seconds:
+            self._checked_at = now
+            try:
+                with INDEX.limit():
+                    fetched = self.index.fetch(ids=[VERSION_VECTOR_ID], namespace=VERSION_NAMESPACE)
+                marker = fetched.vectors.get(VERSION_VECTOR_ID)
+                self._version = marker.metadata["version"] if marker else "unversioned"
+            except Exception as e:
+                print(f"Could not read index version: {e}")
+                self._version = self._version or "unversioned"
+        return self._version
+
+
+def _matches_filter(metadata: dict, filter: dict):
+    """Evaluate a Pinecone-style metadata filter ($eq / $in / $ne on fields)."""
+    for field, condition in filter.items():
+        value = metadata.get(field)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, expected in condition.items():
+            if op == "$eq" and value != expected:
+                return False
+            if op == "$ne" and value == expected:
+                return False
+            if op == "$in" and value not in expected:
+                return False
+            if op == "$nin" and value in expected:
+                return False
+    return True
+
+
+class _Corpus:
+    """One loaded corpus artifact. Replaced as a whole when the files change."""
+
+    def __init__(self, path: str):
+        import numpy as np
+
+        self.path = path
+        self.dir = path
+        self.meta = {"count": 0, "sources": [], "version": None}
+        self.mtime = None
+        self.embeddings = np.zeros((0, EMBEDDING_DIMENSION), dtype=np.float32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.texts = b""
+        self.sources = np.zeros(0, dtype=np.uint8)
+        self.sections = np.zeros(0, dtype=np.int32)
+        self.ids = np.zeros(0, dtype="S1")
+        self.id_lookup = np.zeros(0, dtype=np.int64)
+
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            return
+        self.mtime = os.stat(meta_path).st_mtime_ns
+        with open(meta_path, "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        # Artifacts written before generations existed keep their files beside meta.json.
+        self.dir = os.path.join(path, self.meta.get("dir", ""))
+        if not self.count:
+            return
+
+        # The chunk store is written without embeddings.
+        if os.path.exists(self._file("embeddings.npy")):
+            self.embeddings = np.load(self._file("embeddings.npy"), mmap_mode="r")
+        self.offsets = np.load(self._file("text_offsets.npy"), mmap_mode="r")
+        self.sources = np.load(self._file("sources.npy"), mmap_mode="r")
+        self.sections = np.load(self._file("sections.npy"), mmap_mode="r")
+        self.ids = np.load(self._file("ids.npy"), mmap_mode="r")
+        self.id_lookup = np.load(self._file("id_lookup.npy"), mmap_mode="r")
+        with open(self._file("texts.bin"), "rb") as f:
+            self.texts = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _file(self, name: str):
+        return os.path.join(self.dir, name)
+
+    @property
+    def count(self):
+        return self.meta["count"]
+
+    @property
+    def source_names(self):
+        return self.meta["sources"]
+
+    def close(self):
+        if isinstance(self.texts, mmap.mmap):
+            self.texts.close()
+
+    def row(self, vector_id: str):
+        key = vector_id.encode("utf-8")
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.ids[self.id_lookup[mid]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count:
+            row = int(self.id_lookup[lo])
+            if self.ids[row] == key:
+                return row
+        return None
+
+    def text_bytes(self, row: int):
+        return self.texts[self.offsets[row]:self.offsets[row + 1]]
+
+    def metadata(self, row: int):
+        metadata = {
+            "text": self.text_bytes(row).decode("utf-8"),
+            "source": self.source_names[self.sources[row]]
+        }
+        if self.sections[row] >= 0:
+            metadata["section"] = int(self.sections[row])
+        return metadata
+
+    def values(self, row: int):
+        return [float(x) for x in self.embeddings[row]]
+
+    def source_code(self, source: str):
+        # 255 never names a source, so unknown sources match nothing.
+        return self.source_names.index(source) if source in self.source_names else 255
+
+    def filter_mask(self, filter: dict):
+        """Evaluate a metadata filter over the source/section arrays."""
+        import numpy as np
+
+        mask = np.ones(self.count, dtype=bool)
+        for field, condition in filter.items():
+            if field == "source":
+                values, encode = self.sources, self.source_code
+            elif field == "section":
+                values, encode = self.sections, int
+            else:
+                raise ValueError(f"Local index cannot filter on {field!r}")
+
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, expected in condition.items():
+                if op in ("$eq", "$ne"):
+                    hit = values == encode(expected)
+                elif op in ("$in", "$nin"):
+                    hit = np.isin(values, [encode(v) for v in expected])
+                else:
+                    raise ValueError(f"Unsupported filter operator {op!r}")
+                mask &= ~hit if op in ("$ne", "$nin") else hit
+        return mask
+
+
+def remove_stale_generations(path: str, keep: set):
+    """
+    Delete artifact generations under path other than those in keep. A
+    generation still mapped by another process cannot be removed on Windows;
+    it is left for the next build to try again.
+    """
+    for name in os.listdir(path):
+        if name.startswith("gen-") and name not in keep:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+
+class ArtifactWriter:
+    """
+    Streams rows into a new artifact generation, a directory under `path`
+    with the files listed on LocalVectorStore. Texts and embeddings are
+    written to disk as rows arrive; only IDs and a few numbers per row stay
+    in memory. finish() writes the arrays and then points meta.json at the
+    new directory, so no file a reader may have mapped is ever overwritten.
+    """
+
+    def __init__(self, path: str, with_embeddings: bool = True):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.generation = f"gen-{time.time_ns():x}-{os.getpid()}"
+        self.dir = os.path.join(path, self.generation)
+        os.makedirs(self.dir)
+        self._texts = open(self._file("texts.bin"), "wb")
+        self._embeddings = open(self._file("embeddings.raw"), "wb") if with_embeddings else None
+        self.ids = []
+        # ID -> row for rows not dropped since.
+        self.rows = {}
+        self.offsets = array("q", [0])
+        self.sources = array("B")
+        self.sections = array("i")
+        self.source_names = []
+
+    def _file(self, name: str):
+        return os.path.join(self.dir, name)
+
+    def __contains__(self, vector_id: str):
+        return vector_id in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, vector_id: str, text: bytes, source: str, section: int = -1, values=None):
+        import numpy as np
+
+        self.drop(vector_id)
+        if source not in self.source_names:
+            self.source_names.append(source)
+        self._texts.write(text)
+        if self._embeddings is not None:
+            self._embeddings.write(np.asarray(values, dtype=LOCAL_INDEX_DTYPE).tobytes())
+        self.rows[vector_id] = len(self.ids)
+        self.ids.append(vector_id.encode("utf-8"))
+        self.offsets.append(self.offsets[-1] + len(text))
+        self.sources.append(self.source_names.index(source))
+        self.sections.append(section)
+
+    def drop(self, vector_id: str):
+        # The row's bytes stay in the staged files; finish() leaves them out.
+        self.rows.pop(vector_id, None)
+
+    def metadata(self, row: int, include_text: bool = True):
+        metadata = {"source": self.source_names[self.sources[row]]}
+        if self.sections[row] >= 0:
+            metadata["section"] = self.sections[row]
+        if include_text:
+            self._texts.flush()
+            with open(self._file("texts.bin"), "rb") as f:
+                f.seek(self.offsets[row])
+                metadata["text"] = f.read(self.offsets[row + 1] - self.offsets[row]).decode("utf-8")
+        return metadata
+
+    def embeddings(self):
+        """Every staged embedding row, dropped ones included, read back from disk."""
+        import numpy as np
+
+        self._embeddings.flush()
+        values = np.fromfile(self._file("embeddings.raw"), dtype=LOCAL_INDEX_DTYPE)
+        return values.reshape(-1, EMBEDDING_DIMENSION)
+
+    def discard(self):
+        self._texts.close()
+        if self._embeddings is not None:
+            self._embeddings.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def _compact_texts(self, live):
+        """Rewrite texts.bin without dropped rows; returns the new offsets."""
+        import numpy as np
+
+        offsets = np.zeros(len(live) + 1, dtype=np.int64)
+        source_path = self._file("texts.bin")
+        with open(source_path, "rb") as source, open(f"{source_path}.tmp", "wb") as out:
+            for out_row, row in enumerate(live):
+                source.seek(self.offsets[row])
+                text = source.read(self.offsets[row + 1] - self.offsets[row])
+                out.write(text)
+                offsets[out_row + 1] = offsets[out_row] + len(text)
+        os.replace(f"{source_path}.tmp", source_path)
+        return offsets
+
+    def finish(self):
+        """Write the arrays, publish the generation and return its content version."""
+        import numpy as np
+
+        self._texts.close()
+        live = np.asarray(sorted(self.rows.values()), dtype=np.int64)
+        if len(live) < len(self.ids):
+            offsets = self._compact_texts(live)
+        else:
+            offsets = np.frombuffer(self.offsets, dtype=np.int64)
+
+        if self._embeddings is not None:
+            self._embeddings.close()
+            raw_path = self._file("embeddings.raw")
+            shape = (len(live), EMBEDDING_DIMENSION)
+            if len(live):
+                staged = np.memmap(raw_path, dtype=LOCAL_INDEX_DTYPE, mode="r", shape=(len(self.ids), EMBEDDING_DIMENSION))
+                embeddings = np.lib.format.open_memmap(self._file("embeddings.npy"), mode="w+", dtype=LOCAL_INDEX_DTYPE, shape=shape)
+                # Copied in blocks so the matrix never has to fit in memory.
+                for start in range(0, len(live), 4096):
+                    embeddings[start:start + 4096] = staged[live[start:start + 4096]]
+                embeddings.flush()
+                del embeddings, staged
+            else:
+                np.save(self._file("embeddings.npy"), np.zeros(shape, dtype=LOCAL_INDEX_DTYPE))
+            os.remove(raw_path)
+
+        ids = np.asarray([self.ids[row] for row in live], dtype=f"S{max((len(i) for i in self.ids), default=1)}")
+        id_lookup = np.argsort(ids, kind="stable")
+        version = hashlib.sha256(ids[id_lookup].tobytes()).hexdigest()[:16]
+        arrays = {
+            "text_offsets.npy": offsets,
+            "sources.npy": np.frombuffer(self.sources, dtype=np.uint8)[live],
+            "sections.npy": np.frombuffer(self.sections, dtype=np.int32)[live],
+            "ids.npy": ids,
+            "id_lookup.npy": id_lookup
+        }
+        for name, values in arrays.items():
+            np.save(self._file(name), values)
+
+        # meta.json is only ever read, never mapped, so replacing it is safe
+        # on every platform; it is what switches readers to the new files.
+        meta_path = os.path.join(self.path, "meta.json")
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                previous = json.load(f).get("dir")
+        except FileNotFoundError:
+            previous = None
+        with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "count": len(live),
+                "sources": self.source_names,
+                "version": version,
+                "dir": self.generation
+            }, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+        # The previous generation stays for readers that read the old
+        # meta.json just before the switch and are still opening its files.
+        remove_stale_generations(self.path, {self.generation, previous})
+        if previous is None:
+            # Files of an artifact from before generations, if any.
+            for name in ("embeddings.npy", "texts.bin", *arrays):
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+        return version
+
+
+class LocalVectorStore:
+    """
+    Exact cosine search over a memory-mapped corpus artifact. meta.json in
+    `path` holds the count, source names, a content version and the name of
+    the generation directory with the current files:
+
+        embeddings.npy    (N, D) L2-normalised embedding matrix (LOCAL_INDEX_DTYPE)
+        text_offsets.npy  (N + 1,) int64 byte offsets of each chunk in texts.bin
+        texts.bin         UTF-8 chunk texts, concatenated
+        sources.npy       (N,) uint8 index into meta.json "sources"
+        sections.npy      (N,) int32 section number the chunk opens with, -1 if none
+        ids.npy           (N,) fixed-width chunk IDs
+        id_lookup.npy     (N,) rows in ID order, for binary-search lookups
+
+    Every array is opened with mmap, so uvicorn workers on one host share the
+    same page-cache pages and no Python object is created per chunk. Top-k is
+    a single matrix-vector product. Writes from build_db.py stream into a new
+    generation directory, which flush() completes and publishes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._corpus = _Corpus(path)
+        self._staging = None
+        self._deleted = set()
+
+    @property
+    def version(self):
+        """Content version of the loaded artifact; changes when the corpus does."""
+        return self._corpus.meta["version"]
+
+    def reload_if_changed(self):
+        """Switch to a newer artifact on disk, e.g. after a rebuild. Returns True if reloaded."""
+        meta_path = os.path.join(self.path, "meta.json")
+        try:
+            mtime = os.stat(meta_path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._corpus.mtime:
+            return False
+        corpus = _Corpus(self.path)
+        with self._lock:
+            # Queries already running keep the old arrays they started with.
+            self._corpus = corpus
+            self._deleted = set()
+        return True
+
+    def _live_row(self, corpus: _Corpus, vector_id: str):
+        row = corpus.row(vector_id)
+        return None if row is None or row in self._deleted else row
+
+    def __contains__(self, vector_id: str):
+        staging = self._staging
+        if staging is not None and vector_id in staging:
+            return True
+        return self._live_row(self._corpus, vector_id) is not None
+
+    def __len__(self):
+        staged = len(self._staging) if self._staging is not None else 0
+        return self._corpus.count - len(self._deleted) + staged
+
+    def upsert(self, vectors: list[dict], **kwargs):
+        import numpy as np
+
+        values = np.asarray([v["values"] for v in vectors], dtype=np.float32)
+        values /= np.maximum(np.linalg.norm(values, axis=1, keepdims=True), 1e-12)
+
+        with self._lock:
+            if self._staging is None:
+                self._staging = ArtifactWriter(self.path)
+            for vector, row_values in zip(vectors, values):
+                row = self._live_row(self._corpus, vector["id"])
+                if row is not None:
+                    self._deleted.add(row)
+                metadata = vector.get("metadata", {})
+                self._staging.add(
+                    vector["id"],
+                    metadata.get("text", "").encode("utf-8"),
+                    metadata.get("source", "UNKNOWN"),
+                    metadata.get("section", -1),
+                    row_values
+                )
+
+        return {"upserted_count": len(vectors)}
+
+    def delete(self, ids: list[str] = None, delete_all: bool = False, **kwargs):
+        with self._lock:
+            if delete_all:
+                if self._staging is not None:
+                    self._staging.discard()
+                    self._staging = None
+                self._deleted = set(range(self._corpus.count))
+                return {}
+            for vector_id in ids or []:
+                if self._staging is not None:
+                    self._staging.drop(vector_id)
+                row = self._live_row(self._corpus, vector_id)
+                if row is not None:
+                    self._deleted.add(row)
+        return {}
+
+    def query(self, vector: list[float], top_k: int = 10, include_metadata: bool = False,
+              include_values: bool = False, filter: dict = None, **kwargs):
+        import numpy as np
+
+        query_vector = np.asarray(vector, dtype=np.float32)
+        query_vector /= max(float(np.linalg.norm(query_vector)), 1e-12)
+
+        with self._lock:
+            corpus = self._corpus
+            deleted = list(self._deleted)
+            staging = self._staging
+            staged_rows = sorted(staging.rows.items(), key=lambda item: item[1]) if staging is not None else []
+
+        scores = np.asarray(corpus.embeddings @ query_vector, dtype=np.float32)
+        if filter:
+            scores[~corpus.filter_mask(filter)] = -np.inf
+        if deleted:
+            scores[deleted] = -np.inf
+
+        base_k = min(top_k, int(np.isfinite(scores).sum()))
+        candidates = []
+        if base_k > 0:
+            top = np.argpartition(-scores, base_k - 1)[:base_k]
+            candidates = [(float(scores[row]), int(row), None) for row in top]
+
+        # Vectors streamed in by an unflushed build; only seen during ingestion.
+        if staged_rows:
+            staged_embeddings = staging.embeddings()
+            for vector_id, row in staged_rows:
+                if not filter or _matches_filter(staging.metadata(row, include_text=False), filter):
+                    score = float(np.asarray(staged_embeddings[row], dtype=np.float32) @ query_vector)
+                    candidates.append((score, row, vector_id))
+
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+
+        matches = []
+        for score, row, vector_id in candidates[:top_k]:
+            if vector_id is None:
+                match = {"id": corpus.ids[row].decode("utf-8"), "score": score}
+                if include_metadata:
+                    match["metadata"] = corpus.metadata(row)
+                if include_values:
+                    match["values"] = corpus.values(row)
+            else:
+                match = {"id": vector_id, "score": score}
+                if include_metadata:
+                    match["metadata"] = staging.metadata(row)
+                if include_values:
+                    match["values"] = [float(x) for x in staged_embeddings[row]]
+            matches.append(match)
+        return {"matches": matches}
+
+    def fetch(self, ids: list[str], **kwargs):
+        corpus = self._corpus
+        staging = self._staging
+        vectors = {}
+        for vector_id in ids:
+            if staging is not None and vector_id in staging:
+                row = staging.rows[vector_id]
+                vectors[vector_id] = {
+                    "id": vector_id,
+                    "values": [float(x) for x in staging.embeddings()[row]],
+                    "metadata": staging.metadata(row)
+                }
+                continue
+            row = self._live_row(corpus, vector_id)
+            if row is not None:
+                vectors[vector_id] = {
+                    "id": vector_id,
+                    "values": corpus.values(row),
+                    "metadata": corpus.metadata(row)
+                }
+        return {"vectors": vectors}
+
+    def describe_index_stats(self, **kwargs):
+        return SimpleNamespace(total_vector_count=len(self), dimension=EMBEDDING_DIMENSION)
+
+    def chunk_metadata(self, ids: list[str]):
+        """{id: metadata} for the given IDs, text read straight from the mapped texts.bin."""
+        corpus = self._corpus
+        found = {}
+        for vector_id in ids:
+            row = self._live_row(corpus, vector_id)
+            if row is not None:
+                found[vector_id] = corpus.metadata(row)
+        return found
+
+    def flush(self):
+        """
+        Append the live rows of the current artifact to the streamed build and
+        publish it as a new generation. Processes still mapping the old
+        generation keep reading it until they reload.
+        """
+        with self._lock:
+            corpus = self._corpus
+            writer = self._staging if self._staging is not None else ArtifactWriter(self.path)
+            self._staging = None
+            deleted = self._deleted
+
+        for row in range(corpus.count):
+            if row not in deleted:
+                writer.add(
+                    corpus.ids[row].decode("utf-8"),
+                    corpus.text_bytes(row),
+                    corpus.source_names[corpus.sources[row]],
+                    int(corpus.sections[row]),
+                    corpus.embeddings[row]
+                )
+        writer.finish()
+
+        with self._lock:
+            self._corpus = _Corpus(self.path)
+            self._deleted = set()
+        corpus.close()
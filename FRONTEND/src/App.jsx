@@ -138,6 +138,7 @@ function App() {
   const navigate = useNavigate();
   const [question, setQuestion] = useState('');
   const [history, setHistory] = useState([]);
+  const [sessionId, setSessionId] = useState(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
   const [showWelcome, setShowWelcome] = useState(true);
@@ -178,27 +179,39 @@ function App() {
     setQuestion(''); // Clear input immediately for better UX
 
     try {
-      // Build conversation history in the format expected by backend
-      const conversationHistory = history.map(item => ({
+      const transcript = history.map(item => ({
         role: 'user',
         content: item.question,
         answer: item.answer
       }));
 
-      const response = await fetch('https://lawgpt-rxzx.onrender.com/chat', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ 
-          query: question,
-          conversation_history: conversationHistory
-        }),
-      });
+      const ask = async (activeSessionId) => {
+        const response = await fetch('https://lawgpt-rxzx.onrender.com/chat', {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ 
+            query: question,
+            conversation_history: activeSessionId ? [] : transcript,
+            session_id: activeSessionId
+          }),
+        });
 
-      if (!response.ok) {
-        throw new Error('Server error. Please try again.');
-      }
+        if (!response.ok) {
+          throw new Error('Server error. Please try again.');
+        }
+        return response.json();
+      };
 
-      const data = await response.json();
+      // The backend keeps the conversation once it has issued a session;
+      // the transcript is only sent to start one, or again when the server
+      // has lost the session (restart, expiry or another worker).
+      let data = await ask(sessionId);
+      if (data.session_reset) {
+        data = await ask(null);
+      }
+      if (data.session_id) {
+        setSessionId(data.session_id);
+      }
       
       // Update the history entry with the real answer
       setHistory(prevHistory => 
@@ -225,6 +238,7 @@ function App() {
 
   const handleNewChat = () => {
     setHistory([]);
+    setSessionId(null);
     setQuestion('');
     setShowWelcome(true);
     setError('');